@@ -6,12 +6,36 @@ Copyright (c): 2021 rdbende
 
 # Based on RedFantom's LinkLabel: (https://github.com/RedFantom/ttkwidgets/blob/master/ttkwidgets/linklabel.py)
 
+from concurrent.futures import ThreadPoolExecutor
+import time
 import tkinter as tk
 from tkinter import ttk
-import webbrowser
+import weakref
+
+_executor = None
+
+
+def _launch(url):
+    """Open url in the default webbrowser, webbrowser is only imported when the first link is opened"""
+    import webbrowser
+    return webbrowser.open(url)
+
+
+def _submit(url):
+    """Open url in a worker thread, so a slow browser launch doesn't block the mainloop"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LinkLabel")
+    return _executor.submit(_launch, url)
+
 
 class LinkLabel(ttk.Label):
     """Clickable label that opens a link"""
+
+    visited_urls = set()
+    _links = {}
+    _styles = {}
+
     def __init__(self, master=None, **kwargs):
         """
         Create a clickable label
@@ -23,11 +47,15 @@ class LinkLabel(ttk.Label):
             url (str): the link to be open
             visited (bool): set the label to visited, (False by default)
             visitedcolor (hex-color): text color when link is clicked
+            asynchronous (bool): open the link in a worker thread (False by default)
+            debounce (int): ignore clicks within this time after the previous one (in milliseconds, 500 by default)
+            styled (bool): use a shared ttk style for the colors, and LinkLabel.visited_urls for the visited state (False by default)
             kwargs: options to be passed on to the ttk.Label initializer
             
         Generates:
 
             virtual event: <<LinkOpened>>
+            virtual event: <<LinkFailed>> when the browser couldn't be launched
             
         Variable:
         
@@ -42,15 +70,26 @@ class LinkLabel(ttk.Label):
         self._hovercolor = kwargs.pop("hovercolor", "#00009f")
         self._visitedcolor = kwargs.pop("visitedcolor", "#660099")
         self.is_visited = kwargs.pop("visited", False)
+        self._async = kwargs.pop("asynchronous", False)
+        self._debounce = kwargs.pop("debounce", 500)
+        self._clicked = None
+        self._opening = None
+        self._hover = None
+        self._styled = kwargs.pop("styled", False)
         self._master = master or tk._default_root
         if self._master.tk.call("tk", "windowingsystem") == "aqua":
             self._cursor = kwargs.pop("cursor", "pointinghand")
         else:
             self._cursor = kwargs.pop("cursor", "hand2")
+        if self._styled:
+            ttk.Label.__init__(self, master, cursor=self._cursor, style=self._style(), **kwargs)
+            self.bind("<Button-1>", self._open)
+            LinkLabel._links.setdefault(self._url, weakref.WeakSet()).add(self)
+            self._set_visited(self.is_visited or self._url in LinkLabel.visited_urls)
+            return
         ttk.Label.__init__(self, master, cursor=self._cursor, foreground=self._normalcolor, **kwargs)
         self.bind("<Button-1>", self._open)
-        self.bind("<Enter>", self._enter)
-        self.bind("<Leave>", self._leave)
+        self._bind_hover(True)
         self._leave()
 
     def __getitem__(self, key):
@@ -71,29 +110,140 @@ class LinkLabel(ttk.Label):
         else:
             self.config(foreground=self._normalcolor)
 
+    def _bind_hover(self, bind):
+        """Add or remove the <Enter> and <Leave> bindings that color the label when it isn't styled"""
+        if bind:
+            self._hover = (self.bind("<Enter>", self._enter), self.bind("<Leave>", self._leave))
+        elif self._hover is not None:
+            self.unbind("<Enter>", self._hover[0])
+            self.unbind("<Leave>", self._hover[1])
+            self._hover = None
+
+    def _style(self):
+        """
+        Return the name of a ttk style with these colors, created once per color combination,
+        so hovering is handled by Tk, the visited state is the user1 state
+        """
+        colors = (self._normalcolor, self._hovercolor, self._visitedcolor)
+        key = (self._master.tk, colors)
+        if key not in LinkLabel._styles:
+            name = "Link{}.TLabel".format(len(LinkLabel._styles))
+            style = ttk.Style(self._master)
+            style.configure(name, foreground=self._normalcolor)
+            style.map(name, foreground=[("user1", self._visitedcolor), ("hover", self._hovercolor)])
+            LinkLabel._styles[key] = name
+        return LinkLabel._styles[key]
+
+    def _set_visited(self, visited):
+        """Set the visited state, in styled mode for every label with the same url"""
+        if not self._styled:
+            self.is_visited = visited
+            self._leave()
+            return
+        if visited:
+            LinkLabel.visited_urls.add(self._url)
+        else:
+            LinkLabel.visited_urls.discard(self._url)
+        for label in LinkLabel._links.get(self._url, (self,)):
+            label.is_visited = visited
+            label.state(["user1" if visited else "!user1"])
+
     def _open(self, *args):
         """Open the given url in the default webbrowser"""
-        webbrowser.open(self._url)
-        self.is_visited = True
-        self._leave()
-        self.event_generate("<<LinkOpened>>")
+        now = time.monotonic()
+        if self._opening is not None or (self._clicked is not None and now - self._clicked < self._debounce / 1000):
+            return
+        self._clicked = now
+        if self._async:
+            future = _submit(self._url)
+            self._opening = (future, self.after(20, self._poll, future))
+            return
+        try:
+            opened = _launch(self._url)
+        except Exception:
+            opened = False
+        self._opened(opened)
+
+    def _poll(self, future):
+        """Post the result of the launch back to the mainloop once it's done"""
+        if not future.done():
+            self._opening = (future, self.after(20, self._poll, future))
+            return
+        self._opening = None
+        self._opened(future.exception() is None and future.result())
+
+    def _opened(self, opened):
+        if opened:
+            self._set_visited(True)
+            self.event_generate("<<LinkOpened>>")
+        else:
+            self.event_generate("<<LinkFailed>>")
+
+    def destroy(self):
+        if self._opening is not None:
+            self.after_cancel(self._opening[1])
+            self._opening = None
+        if self._styled:
+            LinkLabel._links.get(self._url, set()).discard(self)
+        ttk.Label.destroy(self)
 
     def reset(self):
         """Reset the visited, and hovered statement"""
-        self.is_visited = False
-        self._leave()
+        self._set_visited(False)
 
     def configure(self, **kwargs):
         """Configure resources of the widget"""
+        styled = kwargs.pop("styled", self._styled)
+        if styled != self._styled:
+            self._set_styled(styled, kwargs)
+        elif self._styled:
+            self._configure_styled(kwargs)
         self._url = kwargs.pop("url", self._url)
         self._normalcolor = kwargs.pop("normalcolor", self._normalcolor)
         self._hovercolor = kwargs.pop("hovercolor", self._hovercolor)
         self._visitedcolor = kwargs.pop("visitedcolor", self._visitedcolor)
         self.is_visited = kwargs.pop("visited", self.is_visited)
+        self._async = kwargs.pop("asynchronous", self._async)
+        self._debounce = kwargs.pop("debounce", self._debounce)
         self._cursor = kwargs.pop("cursor", self._cursor)
         ttk.Label.configure(self, cursor=self._cursor, **kwargs)
 
     config = configure
+
+    def _set_styled(self, styled, kwargs):
+        """Switch between the styled mode and the per-label colors, applying the other link options first"""
+        self._url = kwargs.pop("url", self._url)
+        self._normalcolor = kwargs.pop("normalcolor", self._normalcolor)
+        self._hovercolor = kwargs.pop("hovercolor", self._hovercolor)
+        self._visitedcolor = kwargs.pop("visitedcolor", self._visitedcolor)
+        self.is_visited = kwargs.pop("visited", self.is_visited)
+        self._styled = styled
+        if styled:
+            self._bind_hover(False)
+            LinkLabel._links.setdefault(self._url, weakref.WeakSet()).add(self)
+            ttk.Label.configure(self, foreground="", style=self._style())
+            self._set_visited(self.is_visited or self._url in LinkLabel.visited_urls)
+        else:
+            LinkLabel._links.get(self._url, set()).discard(self)
+            self.state(["!user1"])
+            ttk.Label.configure(self, style="")
+            self._bind_hover(True)
+            self._leave()
+
+    def _configure_styled(self, kwargs):
+        """Apply the options that change the style, the url or the visited state of a styled label"""
+        if "url" in kwargs and kwargs["url"] != self._url:
+            LinkLabel._links.get(self._url, set()).discard(self)
+            self._url = kwargs.pop("url")
+            LinkLabel._links.setdefault(self._url, weakref.WeakSet()).add(self)
+            kwargs.setdefault("visited", self._url in LinkLabel.visited_urls)
+        if any(key in kwargs for key in ("normalcolor", "hovercolor", "visitedcolor")):
+            self._normalcolor = kwargs.pop("normalcolor", self._normalcolor)
+            self._hovercolor = kwargs.pop("hovercolor", self._hovercolor)
+            self._visitedcolor = kwargs.pop("visitedcolor", self._visitedcolor)
+            kwargs["style"] = self._style()
+        if "visited" in kwargs:
+            self._set_visited(kwargs.pop("visited"))
         
     def cget(self, key):
         """Return the resource value for a KEY given as string"""
@@ -107,12 +257,18 @@ class LinkLabel(ttk.Label):
             return self._visitedcolor
         elif key == "visited":
             return self.is_visited
+        elif key == "asynchronous":
+            return self._async
+        elif key == "debounce":
+            return self._debounce
+        elif key == "styled":
+            return self._styled
         else:
             return ttk.Label.cget(self, key)    
     
     def keys(self):
         """Return a list of all resource names of this widget"""
         keys = ttk.Label.keys(self)
-        keys.extend(["hovercolor", "normalcolor", "url", "visited", "visitedcolor", ])
+        keys.extend(["asynchronous", "debounce", "hovercolor", "normalcolor", "styled", "url", "visited", "visitedcolor", ])
         keys.sort()
         return keys
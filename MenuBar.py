@@ -4,8 +4,219 @@ License: GNU GPLv3
 Copyright (c): 2021 rdbende
 """
 
+import json
+import re
 import tkinter as tk
 
+_keysyms = {"+": "plus", "-": "minus", "=": "equal", ",": "comma", ".": "period", "/": "slash", ";": "semicolon",
+            "Del": "Delete", "Esc": "Escape", "Enter": "Return", "Space": "space", "Ins": "Insert",
+            "PgUp": "Prior", "PgDn": "Next"}
+
+_modifiers = {"Ctrl": "Control", "Control": "Control", "Alt": "Alt", "Option": "Option", "Opt": "Option",
+              "Cmd": "Command", "Command": "Command", "Shift": "Shift", "Meta": "Meta"}
+
+
+def _sequence(accelerator, aqua=False):
+    """
+    Convert an accelerator label, like Ctrl+Shift+S or Ctrl-S, to an event sequence,
+    or return None if it isn't one, as accelerators are free text for Tk
+    """
+    *modifiers, key = re.split(r"[+-](?=.)", accelerator.strip())
+    try:
+        modifiers = [_modifiers[modifier.capitalize()] for modifier in modifiers]
+    except KeyError:
+        return None
+    if not key or any(char.isspace() for char in key):
+        return None
+    if not aqua:
+        modifiers = ["Control" if modifier == "Command" else "Alt" if modifier == "Option" else modifier for modifier in modifiers]
+    key = _keysyms.get(key, key)
+    if len(key) == 1 and key.isalpha():
+        if "Shift" in modifiers:
+            modifiers.remove("Shift")
+            key = key.upper()
+        else:
+            key = key.lower()
+    elif key.isdigit():
+        key = "Key-" + key
+    return "<{}>".format("-".join(modifiers + [key]))
+
+
+# Tcl lambda returning the type, label and cascade menu of every entry of a menu, in one call
+_signature = """m {
+    set entries {}
+    set end [$m index end]
+    if {$end eq "none" || $end eq ""} {return $entries}
+    for {set i 0} {$i <= $end} {incr i} {
+        set type [$m type $i]
+        set label {}
+        catch {set label [$m entrycget $i -label]}
+        lappend entries $type $label
+        if {$type eq "cascade"} {lappend entries [$m entrycget $i -menu]}
+    }
+    return $entries
+}"""
+
+
+def _entries(spec):
+    """Normalize a spec to a list of entry dicts"""
+    if isinstance(spec, dict):
+        spec = [{"label": label, "menu": value} if isinstance(value, (list, dict)) else {"label": label, "command": value}
+                for label, value in spec.items()]
+    return [{"type": "separator"} if entry in ("-", "separator") else dict(entry) for entry in spec]
+
+
+def _score(query, text):
+    """Return how well query fuzzy matches text, or None if its characters don't appear in order"""
+    score = 0
+    last = -1
+    for char in query:
+        position = text.find(char, last + 1)
+        if position < 0:
+            return None
+        if position == last + 1:
+            score += 3
+        if position == 0 or not text[position - 1].isalnum():
+            score += 2
+        score += 1 - (position - last - 1) * 0.1
+        last = position
+    return score
+
+
+class Command:
+    """A menu entry found by CommandIndex"""
+
+    __slots__ = ("label", "path", "accelerator", "_tk", "_menu", "_index", "_text")
+
+    def __init__(self, interp, menu, index, label, path, accelerator):
+        self.label = label
+        self.path = path
+        self.accelerator = accelerator
+        self._tk = interp
+        self._menu = menu
+        self._index = index
+        self._text = " > ".join(path + (label,)).lower()
+
+    def __repr__(self):
+        return "<Command {!r}>".format(" > ".join(self.path + (self.label,)))
+
+    def _label(self, index):
+        try:
+            return str(self._tk.call(self._menu, "entrycget", index, "-label"))
+        except tk.TclError:
+            return None
+
+    def invoke(self):
+        """Invoke the menu entry, like clicking on it, looking it up by its label if it moved"""
+        if self._label(self._index) != self.label:
+            try:
+                end = self._tk.call(self._menu, "index", "end")
+            except tk.TclError:
+                end = "none"
+            count = -1 if end in ("none", "") else int(end)
+            for index in range(count + 1):
+                if self._label(index) == self.label:
+                    self._index = index
+                    break
+            else:
+                raise LookupError("{!r} is no longer in the menu".format(self))
+        return self._tk.call(self._menu, "invoke", self._index)
+
+
+class CommandIndex:
+    """
+    The commands, checkbuttons and radiobuttons of a menubar and its cascades,
+    searchable by fuzzy matching their label and the labels of their cascades
+    """
+
+    def __init__(self, menubar):
+        self._menubar = menubar
+        self._menus = {}
+        self._query = None
+        self._matches = None
+        self._walk(str(menubar), ())
+
+    def __iter__(self):
+        for signature, commands, cascades, path in list(self._menus.values()):
+            yield from commands
+
+    def __len__(self):
+        return sum(len(entry[1]) for entry in self._menus.values())
+
+    def _walk(self, menu, path):
+        """Index the entries of menu and its cascades"""
+        call = self._menubar.tk.call
+        end = call(menu, "index", "end")
+        count = -1 if end in ("none", "") else int(end)
+        commands = []
+        cascades = []
+        self._menus[menu] = (self._signature(menu), commands, cascades, path)
+        for index in range(count + 1):
+            kind = call(menu, "type", index)
+            if kind in ("separator", "tearoff"):
+                continue
+            label = str(call(menu, "entrycget", index, "-label"))
+            if kind == "cascade":
+                submenu = str(call(menu, "entrycget", index, "-menu"))
+                if submenu and submenu not in self._menus:
+                    cascades.append(submenu)
+                    self._walk(submenu, path + (label,))
+            else:
+                accelerator = str(call(menu, "entrycget", index, "-accelerator"))
+                commands.append(Command(self._menubar.tk, menu, index, label, path, accelerator))
+
+    def _signature(self, menu):
+        """Return the types, labels and cascades of the entries of menu, to notice when they change"""
+        return tuple(str(item) for item in self._menubar.tk.splitlist(self._menubar.tk.call("apply", _signature, menu)))
+
+    def _forget(self, menu):
+        for cascade in self._menus.pop(menu)[2]:
+            if cascade in self._menus:
+                self._forget(cascade)
+
+    def refresh(self):
+        """Index again the menus whose entries changed, with one Tcl call per menu if nothing did"""
+        changed = False
+        for menu in list(self._menus):
+            if menu not in self._menus:
+                continue
+            try:
+                signature = self._signature(menu)
+            except tk.TclError:
+                self._forget(menu)
+                changed = True
+                continue
+            if signature != self._menus[menu][0]:
+                path = self._menus[menu][3]
+                self._forget(menu)
+                self._walk(menu, path)
+                changed = True
+        if changed:
+            self._query = self._matches = None
+        return changed
+
+    def search(self, query, limit=None):
+        """
+        Return the commands matching query, best matches first. When query extends the
+        previous one, only the previous matches are searched again
+        """
+        query = query.lower()
+        if self._query is not None and query.startswith(self._query):
+            candidates = self._matches
+        else:
+            self.refresh()
+            candidates = list(self)
+        matches = []
+        for command in candidates:
+            score = _score(query, command._text)
+            if score is not None:
+                matches.append((score, command))
+        self._query = query
+        self._matches = [command for score, command in matches]
+        matches.sort(key=lambda match: (-match[0], len(match[1]._text)))
+        return [command for score, command in matches[:limit]]
+
+
 class MenuBar(tk.Menu):
     """A simple menubar for Tkinter windows"""
     
@@ -22,8 +233,12 @@ class MenuBar(tk.Menu):
         
             add_submenu: alias for add_cascade
             add_applemenu: create Apple-icon menu on Mac
+            build: create menus, submenus and their entries from a nested spec
+            commands: return the CommandIndex of the menubar, for searching its commands
         """
         tk.Menu.__init__(self, **kwargs)
+        self._master = master
+        self._commands = None
         try:
             master.option_add("*tearOff", tearoff)
             master.configure(menu=self)
@@ -40,3 +255,66 @@ class MenuBar(tk.Menu):
         self.apple_menu = tk.Menu(self, *args, **kwargs)
         self.add_cascade(menu=self.apple_menu)
         
+    def build(self, spec, commands=None):
+        """
+        Create cascades and entries from a nested spec, with a single Tcl evaluation for all entries
+        
+        The spec is a list of entry dicts (or a JSON string of it), or a dict mapping labels
+        to commands or to nested specs. An entry dict holds tk.Menu entry options, and a
+        type key (command, checkbutton, radiobutton, separator or cascade). A menu key
+        containing a nested spec creates a cascade, and "-" is a separator. Commands given
+        as strings are looked up in the commands mapping. Accelerators are bound on the
+        master window to invoke the entry.
+        """
+        if isinstance(spec, str):
+            spec = json.loads(spec)
+        commands = commands or {}
+        aqua = self.tk.call("tk", "windowingsystem") == "aqua"
+        script = []
+        accelerators = []
+        
+        def convert(value):
+            if isinstance(value, str) and value in commands:
+                value = commands[value]
+            if callable(value):
+                return self._register(value)
+            return value
+        
+        def build(menu, spec, index):
+            for entry in _entries(spec):
+                kind = entry.pop("type", "cascade" if "menu" in entry else "command")
+                if isinstance(entry.get("menu"), (list, dict)):
+                    submenu = tk.Menu(menu)
+                    end = submenu.index("end")
+                    build(submenu, entry["menu"], 0 if end is None else end + 1)
+                    entry["menu"] = submenu
+                if "command" in entry:
+                    entry["command"] = convert(entry["command"])
+                if "accelerator" in entry and kind != "cascade":
+                    sequence = _sequence(str(entry["accelerator"]), aqua)
+                    if sequence is not None:
+                        accelerators.append((sequence, menu, index))
+                options = []
+                for key, value in entry.items():
+                    options.extend(("-" + key, value))
+                script.append(tk._join([str(menu), "add", kind] + options))
+                index += 1
+            
+        end = self.index("end")
+        build(self, spec, 0 if end is None else end + 1)
+        self.tk.eval("\n".join(script))
+        for sequence, menu, index in accelerators:
+            def invoke(event, menu=menu, index=index):
+                menu.invoke(index)
+                return "break"
+            try:
+                self._master.bind(sequence, invoke, add="+")
+            except tk.TclError:
+                # Only shown in the menu, like an accelerator Tk doesn't know the key of
+                pass
+            
+    def commands(self):
+        """Return the CommandIndex of the menubar, created the first time it's needed"""
+        if self._commands is None:
+            self._commands = CommandIndex(self)
+        return self._commands
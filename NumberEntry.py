@@ -6,12 +6,432 @@ Copyright (c) 2021 rdbende
 
 import tkinter as tk
 from tkinter import ttk
+from decimal import Decimal, DivisionByZero, InvalidOperation, Overflow, ROUND_HALF_UP
+from functools import lru_cache
+import math
+import operator
+import re
+
+
+_token_re = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(\*\*|//|[-+*/%(),]))")
+
+_constants = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+_functions = {
+    "abs": abs, "round": round, "min": min, "max": max,
+    "sqrt": math.sqrt, "exp": math.exp, "log": math.log, "log10": math.log10,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan,
+    "asin": math.asin, "acos": math.acos, "atan": math.atan,
+    "floor": math.floor, "ceil": math.ceil, "radians": math.radians, "degrees": math.degrees,
+}
+
+_decimal_constants = {name: Decimal(repr(value)) for name, value in _constants.items()}
+
+_decimal_functions = {
+    "abs": abs, "round": round, "min": min, "max": max,
+    "sqrt": lambda x: Decimal(x).sqrt(), "exp": lambda x: Decimal(x).exp(),
+    "log": lambda x: Decimal(x).ln(), "log10": lambda x: Decimal(x).log10(),
+    "floor": math.floor, "ceil": math.ceil,
+}
+
+
+def _power(base, exponent):
+    """
+    Exponentiation that can't hang on huge integer results, integer results
+    that could exceed 8192 bits are calculated as floats, raising OverflowError
+    """
+    if isinstance(base, int) and isinstance(exponent, int) and abs(base).bit_length() * abs(exponent) > 8192:
+        base = float(base)
+    result = base ** exponent
+    if isinstance(result, complex):
+        raise ValueError("math domain error")
+    return result
+
+
+_binary = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+           "//": operator.floordiv, "%": operator.mod, "**": _power}
+
+
+def _tokenize(source, decimal=False):
+    """Split an expression into (kind, value) tokens"""
+    tokens = []
+    position = 0
+    source = source.rstrip()
+    while position < len(source):
+        match = _token_re.match(source, position)
+        if match is None:
+            raise SyntaxError("invalid character {!r}".format(source[position].strip() or source[position]))
+        number, name, op = match.groups()
+        if number is not None:
+            if decimal:
+                tokens.append(("num", Decimal(number)))
+            else:
+                tokens.append(("num", float(number) if any(c in number for c in ".eE") else int(number)))
+        elif name is not None:
+            tokens.append(("name", name))
+        else:
+            tokens.append(("op", op))
+        position = match.end()
+    tokens.append(("end", None))
+    return tokens
+
+
+class CycleError(ValueError):
+    """Raised when a formula would reference itself through other cells"""
+
+
+class _Parser:
+    """Recursive descent parser compiling tokens into nested closures, folding constants"""
+
+    maxdepth = 100
+
+    def __init__(self, tokens, decimal=False):
+        self._tokens = tokens
+        self._index = 0
+        self._depth = 0
+        self._decimal = decimal
+        self._constants = _decimal_constants if decimal else _constants
+        self._functions = _decimal_functions if decimal else _functions
+        self.names = set()
+
+    def _peek(self):
+        return self._tokens[self._index]
+
+    def _next(self):
+        token = self._tokens[self._index]
+        self._index += 1
+        return token
+
+    def _expect(self, op):
+        if self._next() != ("op", op):
+            raise SyntaxError("expected {!r}".format(op))
+
+    def parse(self):
+        node = self._expr()
+        if self._peek()[0] != "end":
+            raise SyntaxError("unexpected {!r}".format(self._peek()[1]))
+        return node
+
+    def _binary(self, operand, ops):
+        left = operand()
+        rest = []
+        while self._peek()[0] == "op" and self._peek()[1] in ops:
+            function = _binary[self._next()[1]]
+            right = operand()
+            if not rest and hasattr(left, "value") and hasattr(right, "value"):
+                left = _apply(function, left, right)
+            else:
+                rest.append((function, right))
+        return _chain(left, rest) if rest else left
+
+    def _expr(self):
+        return self._binary(self._term, ("+", "-"))
+
+    def _term(self):
+        return self._binary(self._unary, ("*", "/", "//", "%"))
+
+    def _unary(self):
+        # Every nested operand passes through here, so this bounds the recursion of the parser and the closures
+        self._depth += 1
+        if self._depth > self.maxdepth:
+            raise SyntaxError("expression is nested too deeply")
+        try:
+            if self._peek() in (("op", "-"), ("op", "+")):
+                function = operator.neg if self._next()[1] == "-" else operator.pos
+                return _apply(function, self._unary())
+            return self._power()
+        finally:
+            self._depth -= 1
+
+    def _power(self):
+        base = self._atom()
+        if self._peek() == ("op", "**"):
+            self._next()
+            return _apply(_power, base, self._unary())
+        return base
+
+    def _atom(self):
+        kind, value = self._next()
+        if kind == "num":
+            return _const(value)
+        if kind == "op" and value == "(":
+            node = self._expr()
+            self._expect(")")
+            return node
+        if kind == "name":
+            if self._peek() == ("op", "("):
+                if value not in self._functions:
+                    raise SyntaxError("unknown function {!r}".format(value))
+                self._next()
+                args = []
+                if self._peek() != ("op", ")"):
+                    args.append(self._expr())
+                    while self._peek() == ("op", ","):
+                        self._next()
+                        args.append(self._expr())
+                self._expect(")")
+                return _apply(_call(self._functions[value]), *args)
+            if value in self._constants:
+                return _const(self._constants[value])
+            self.names.add(value)
+            return _variable(value, self._decimal)
+        raise SyntaxError("unexpected {!r}".format(value) if value else "unexpected end of expression")
+
+
+def _const(value):
+    function = lambda names: value
+    function.value = value
+    return function
+
+
+def _variable(name, decimal=False):
+    def variable(names):
+        try:
+            value = names[name]
+        except KeyError:
+            raise NameError("unknown name {!r}".format(name)) from None
+        if decimal and not isinstance(value, Decimal):
+            return Decimal(repr(value))
+        if not decimal and isinstance(value, Decimal):
+            return float(value)
+        return value
+    return variable
+
+
+def _call(function):
+    def call(*args):
+        try:
+            return function(*args)
+        except TypeError as error:
+            raise SyntaxError(str(error)) from None
+    return call
+
+
+def _apply(function, *args):
+    """Return a closure applying function to the operand closures, or a constant if they're all constant"""
+    if all(hasattr(arg, "value") for arg in args):
+        try:
+            return _const(function(*(arg.value for arg in args)))
+        except (ArithmeticError, ValueError):
+            pass
+    if len(args) == 1:
+        arg, = args
+        return lambda names: function(arg(names))
+    if len(args) == 2:
+        left, right = args
+        return lambda names: function(left(names), right(names))
+    return lambda names: function(*(arg(names) for arg in args))
+
+
+def _chain(first, rest):
+    """Return a closure applying a left-associative chain of operators in a loop, instead of nesting a closure per operator"""
+    def chain(names):
+        value = first(names)
+        for function, operand in rest:
+            value = function(value, operand(names))
+        return value
+    return chain
+
+
+_expression_chars = re.compile(r"[0-9+\-*/%.(), a-z_=]*")
+_number_chars = re.compile(r"[0-9.]*")
+
+
+@lru_cache(maxsize=1024)
+def _compile(source, decimal=False):
+    """
+    Compile an arithmetic expression into a callable, caching it by its source
+    
+    The callable takes a mapping of the referenced names to their values,
+    the referenced names are listed in its 'names' attribute
+    """
+    parser = _Parser(_tokenize(source, decimal), decimal)
+    function = parser.parse()
+    if decimal:
+        function = _decimal_errors(function)
+    function.names = frozenset(parser.names)
+    return function
+
+
+def _decimal_errors(function):
+    """Turn the decimal module's signals into the errors NumberEntry displays"""
+    def checked(names):
+        try:
+            return function(names)
+        except DivisionByZero:
+            raise ZeroDivisionError("division by zero") from None
+        except Overflow:
+            raise OverflowError("numerical result out of range") from None
+        except InvalidOperation:
+            raise ValueError("invalid decimal operation") from None
+    return checked
+
+
+class Sheet:
+    """
+    A dependency graph between named NumberEntries, recomputing only the
+    formulas affected by a change, once per event loop turn
+    """
+
+    def __init__(self):
+        self._cells = {}
+        self._texts = {}
+        self._formulas = {}
+        self._values = {}
+        self._depends = {}
+        self._dependents = {}
+        self._dirty = set()
+        self._after = None
+
+    def __contains__(self, name):
+        return name in self._cells
+
+    def __getitem__(self, name):
+        """Return the current value of a cell"""
+        return self._values[name]
+
+    def add(self, name, entry):
+        """Register entry under name"""
+        if not name.isidentifier() or name in _constants or name in _functions:
+            raise ValueError("invalid cell name {!r}".format(name))
+        if name in self._cells and self._cells[name] is not entry:
+            raise ValueError("cell {!r} is already in the sheet".format(name))
+        self._cells[name] = entry
+        self._dependents.setdefault(name, set())
+        self._depends.setdefault(name, frozenset())
+        self._dirty.update(self._dependents[name])
+        self._schedule()
+
+    def remove(self, name):
+        """Unregister a cell, its dependents will show a NameError"""
+        entry = self._cells.pop(name, None)
+        if self._after is not None and self._after[0] is entry:
+            entry.after_cancel(self._after[1])
+            self._after = None
+        self._texts.pop(name, None)
+        self._formulas.pop(name, None)
+        self._values.pop(name, None)
+        self._link(name, frozenset())
+        self._dirty.discard(name)
+        self._dirty.update(self._dependents.get(name, ()))
+        if not self._dependents.get(name):
+            self._dependents.pop(name, None)
+            self._depends.pop(name, None)
+        self._schedule()
+
+    def formula(self, name):
+        """Return the text of the cell as it was entered"""
+        return self._texts.get(name)
+
+    def set(self, name, text):
+        """Set the text of a cell, and schedule the recomputation of its dependents"""
+        entry = self._cells[name]
+        if self._texts.get(name) == text and name in self._values:
+            entry._show(self._values[name])
+            return
+        function = _compile(text[1:] if text.startswith("=") else text, entry._decimal)
+        if self._reaches(function.names, name):
+            raise CycleError("{!r} references itself".format(name))
+        self._texts[name] = text
+        self._formulas[name] = function
+        self._link(name, function.names)
+        self._dirty.add(name)
+        self._schedule()
+
+    def invalidate(self, name):
+        """Schedule the recomputation of a cell, e.g. after its rounding changed"""
+        text = self._texts.get(name)
+        if text is not None:
+            self._formulas[name] = _compile(text[1:] if text.startswith("=") else text, self._cells[name]._decimal)
+        self._dirty.add(name)
+        self._schedule()
+
+    def _link(self, name, depends):
+        for other in self._depends.get(name, ()):
+            self._dependents[other].discard(name)
+        for other in depends:
+            self._dependents.setdefault(other, set()).add(name)
+            self._depends.setdefault(other, frozenset())
+        self._depends[name] = depends
+
+    def _reaches(self, names, target):
+        """Return True if target is among names or their dependencies"""
+        stack = list(names)
+        seen = set()
+        while stack:
+            name = stack.pop()
+            if name == target:
+                return True
+            if name not in seen:
+                seen.add(name)
+                stack.extend(self._depends.get(name, ()))
+        return False
+
+    def _schedule(self):
+        if self._after is None and self._dirty and self._cells:
+            widget = next(iter(self._cells.values()))
+            self._after = (widget, widget.after_idle(self.flush))
+
+    def flush(self):
+        """Recompute the dirty cells and everything downstream of them, in topological order"""
+        if self._after is not None:
+            widget, after = self._after
+            self._after = None
+            try:
+                widget.after_cancel(after)
+            except tk.TclError:
+                pass
+        affected = set()
+        stack = list(self._dirty)
+        while stack:
+            name = stack.pop()
+            if name not in affected:
+                affected.add(name)
+                stack.extend(self._dependents.get(name, ()))
+        indegree = {name: len(self._depends.get(name, ()) & affected) for name in affected}
+        ready = [name for name, count in indegree.items() if count == 0]
+        edited = set(self._dirty)
+        changed = set(edited)
+        self._dirty.clear()
+        while ready:
+            name = ready.pop()
+            if name in changed or not self._depends.get(name, frozenset()).isdisjoint(changed):
+                if self._compute(name, name in edited):
+                    changed.add(name)
+                else:
+                    changed.discard(name)
+            for other in self._dependents.get(name, ()):
+                if other in indegree:
+                    indegree[other] -= 1
+                    if indegree[other] == 0:
+                        ready.append(other)
+
+    def _compute(self, name, edited):
+        """Evaluate a cell, update its entry, and return True if its value changed"""
+        entry = self._cells.get(name)
+        function = self._formulas.get(name)
+        if entry is None or function is None:
+            return self._values.pop(name, None) is not None
+        old = self._values.get(name)
+        try:
+            value = entry._result(function(self._values))
+        except (SyntaxError, ZeroDivisionError, ValueError, OverflowError, NameError) as error:
+            self._values.pop(name, None)
+            value = text = type(error).__name__
+        else:
+            self._values[name] = text = value
+        if edited or str(entry.tk.call("focus")) != str(entry):
+            entry._show(text)
+        return self._values.get(name) != old
 
 
 class NumberEntry(ttk.Entry):
     """
     An entry that takes only numbers or calculations and calculates the result of the calculation
     """
+
+    _errors = ("SyntaxError", "ZeroDivisionError", "ValueError", "OverflowError", "NameError", "CycleError")
+
     def __init__(self, master=None, **kwargs):
         """
         Create a NumberEntry
@@ -20,14 +440,29 @@ class NumberEntry(ttk.Entry):
         
         expressions: allow the use of expressions (default is True)
         roundto: (int) the number of decimals in the result (default is 0)
+        incremental: (bool) reject not allowed characters with validatecommand before they are inserted,
+                     instead of rewriting the whole text on every key release (default is False)
+        sheet: (Sheet) the sheet whose cells can be referenced in formulas like '=price*qty'
+        cellname: (str) the name other cells of the sheet can reference this entry by
+        decimal: (bool) calculate with arbitrary precision decimal numbers, and round half up (default is False)
         kwargs: options to be passed on to the ttk.Entry initializer
         """
         self._expr = kwargs.pop("expressions", True)
         self._round = kwargs.pop("roundto", 0)
+        self._incremental = kwargs.pop("incremental", False)
+        self._sheet = kwargs.pop("sheet", None)
+        self._cellname = kwargs.pop("cellname", None)
+        self._decimal = kwargs.pop("decimal", False)
+        self._writing = False
+        self._check_id = None
         ttk.Entry.__init__(self, master, **kwargs)
+        self._vcmd = self.register(self._validate)
         self.bind("<Return>", self._eval)
         self.bind("<FocusOut>", self._eval)
-        self.bind("<KeyRelease>", self._check)
+        self.bind("<FocusIn>", self._edit)
+        self.bind("<Destroy>", self._leave_sheet)
+        self._bind_check()
+        self._join_sheet()
         
     def __getitem__(self, key):
         return self.cget(key)
@@ -35,31 +470,127 @@ class NumberEntry(ttk.Entry):
     def __setitem__(self, key, value):
         self.configure(**{key: value})
     
+    def _bind_check(self):
+        """Switch between validatecommand and KeyRelease checking"""
+        if self._incremental:
+            if self._check_id is not None:
+                self.unbind("<KeyRelease>", self._check_id)
+                self._check_id = None
+            ttk.Entry.configure(self, validate="key", validatecommand=(self._vcmd, "%d", "%S", "%P"))
+        elif self._check_id is None:
+            self._check_id = self.bind("<KeyRelease>", self._check)
+
+    def _validate(self, action, text, new):
+        """Allow deletions, and insertions made only of allowed characters"""
+        if self._writing or action != "1" or new in self._errors:
+            return True
+        chars = _expression_chars if self._expr else _number_chars
+        return chars.fullmatch(text) is not None
+
+    def _set(self, text):
+        """Replace the text of the entry bypassing the validation"""
+        self._writing = True
+        try:
+            self.delete(0, "end")
+            self.insert(0, text)
+        finally:
+            self._writing = False
+
+    def _join_sheet(self):
+        if self._sheet is not None and self._cellname is not None:
+            self._sheet.add(self._cellname, self)
+
+    def _leave_sheet(self, *args):
+        if self._sheet is not None and self._cellname is not None and self._sheet._cells.get(self._cellname) is self:
+            self._sheet.remove(self._cellname)
+
+    def _edit(self, *args):
+        """Show the formula of the cell instead of its value while editing"""
+        if self._sheet is not None and self._cellname is not None:
+            text = self._sheet.formula(self._cellname)
+            if text is not None and text.startswith("="):
+                self._set(text)
+
+    def _result(self, value):
+        """Round a calculated value"""
+        if self._decimal:
+            if not isinstance(value, Decimal):
+                value = Decimal(repr(value))
+            try:
+                return value.quantize(Decimal(1).scaleb(-int(self._round)), rounding=ROUND_HALF_UP)
+            except InvalidOperation:
+                raise ValueError("too many digits") from None
+        if int(self._round) == 0:
+            return int(round(value, 0))
+        return round(float(value), self._round)
+
+    def _show(self, text):
+        """Display a result or an error name"""
+        self._set(text)
+        if text in self._errors:
+            self.select_range(0, "end")
+
     def _eval(self, *args):
         """Calculate the result of the entered calculation"""
         current = self.get()
         try:
-            if len(current) > 0:
-                if int(self._round) == 0:
-                    result = int(round(eval(current), 0))
-                    self.delete(0, "end")
-                    self.insert(0, result)         
+            if len(current) > 0 and current not in self._errors:
+                if self._sheet is not None and self._cellname is not None:
+                    self._sheet.set(self._cellname, current)
                 else:
-                    result = round(float(eval(current)), self._round)
-                    self.delete(0, "end")
-                    self.insert(0, result)
-        except SyntaxError:
-            self.delete(0, "end")
-            self.insert(0, "SyntaxError")
-            self.select_range(0, "end")
-        except ZeroDivisionError:
-            self.delete(0, "end")
-            self.insert(0, "ZeroDivisionError")
-            self.select_range(0, "end")
+                    self._set(self._result(_compile(current, self._decimal)({})))
+        except (SyntaxError, ZeroDivisionError, ValueError, OverflowError, NameError) as error:
+            self._show(type(error).__name__)
         
+    @staticmethod
+    def evaluate_all(entries, roundto=None):
+        """
+        Calculate the result of many entries at once, optionally changing their roundto first
+
+        The texts are read and the results are written back in a single Tcl call,
+        and rounded the same way as when they're calculated one by one.
+        Entries of a Sheet are recomputed by their sheet instead.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        plain = []
+        for entry in entries:
+            if roundto is not None:
+                entry._round = roundto
+            if entry._sheet is not None and entry._cellname is not None:
+                entry._sheet.invalidate(entry._cellname)
+            else:
+                plain.append(entry)
+        if not plain:
+            return
+        interp = plain[0].tk
+        texts = interp.splitlist(interp.eval("list " + " ".join("[{} get]".format(entry._w) for entry in plain)))
+        results = [None] * len(plain)
+        for index, (entry, text) in enumerate(zip(plain, texts)):
+            if len(text) == 0 or text in NumberEntry._errors:
+                continue
+            try:
+                results[index] = entry._result(_compile(text, entry._decimal)({}))
+            except (SyntaxError, ZeroDivisionError, ValueError, OverflowError, NameError) as error:
+                results[index] = type(error).__name__
+        script = []
+        for entry, result in zip(plain, results):
+            if result is not None:
+                script.append("{0} delete 0 end; {0} insert 0 {{{1}}}".format(entry._w, result))
+                if result in NumberEntry._errors:
+                    script.append("{} selection range 0 end".format(entry._w))
+        for entry in plain:
+            entry._writing = True
+        try:
+            interp.eval("\n".join(script))
+        finally:
+            for entry in plain:
+                entry._writing = False
+
     def _check(self, *args):
         typed = self.get()
-        if not typed == "SyntaxError" and not typed == "ZeroDivisionError":
+        if typed not in self._errors:
             checked = self._replace(typed)
             self.delete(0, "end")
             self.insert(0, checked)
@@ -67,7 +598,8 @@ class NumberEntry(ttk.Entry):
     def _replace(self, typed) -> str:
         """Delete the not allowed characters"""
         if self._expr:
-            allowed = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "+", "-", "*", "/", "%", "."]
+            allowed = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "+", "-", "*", "/", "%", ".",
+                       "(", ")", ",", " ", "_", "="] + list("abcdefghijklmnopqrstuvwxyz")
         else:
             allowed = ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "."]
         for current in typed:
@@ -77,9 +609,26 @@ class NumberEntry(ttk.Entry):
 
     def configure(self, **kwargs):
         """Configure resources of the widget."""
+        rounding = "roundto" in kwargs or "decimal" in kwargs
         self._expr = kwargs.pop("expressions", self._expr)
         self._round = kwargs.pop("roundto", self._round)
+        self._decimal = kwargs.pop("decimal", self._decimal)
+        incremental = kwargs.pop("incremental", self._incremental)
+        sheet = kwargs.pop("sheet", self._sheet)
+        cellname = kwargs.pop("cellname", self._cellname)
         ttk.Entry.configure(self, **kwargs)
+        if sheet is not self._sheet or cellname != self._cellname:
+            self._leave_sheet()
+            self._sheet = sheet
+            self._cellname = cellname
+            self._join_sheet()
+        elif rounding and self._sheet is not None and self._cellname is not None:
+            self._sheet.invalidate(self._cellname)
+        if incremental != self._incremental:
+            self._incremental = incremental
+            if not incremental:
+                ttk.Entry.configure(self, validate="none")
+            self._bind_check()
 
     config = configure
     
@@ -89,12 +638,20 @@ class NumberEntry(ttk.Entry):
             return self._expr
         elif key == "roundto":
             return self._round
+        elif key == "incremental":
+            return self._incremental
+        elif key == "sheet":
+            return self._sheet
+        elif key == "cellname":
+            return self._cellname
+        elif key == "decimal":
+            return self._decimal
         else:
             return ttk.Entry.cget(self, key)
         
     def keys(self):
         """Return a list of all resource names of this widget"""
         keys = ttk.Entry.keys(self)
-        keys.extend(["expressions", "roundto"])
+        keys.extend(["cellname", "decimal", "expressions", "incremental", "roundto", "sheet"])
         keys = sorted(keys)
         return keys
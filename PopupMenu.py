@@ -18,7 +18,17 @@ class PopupMenu(tk.Menu):
             
             offsetx (int): the X offset popup relative to the cursor ()
             offsety (int): the Y offset relative to the cursor ()
+            provider (callable): function returning the entries of the menu, called with the widget when the menu is about to be posted
+            version (callable): function returning a token, the provider is only called again when the token changes
+            bindtag (str): bind the popup to this bindtag instead of the master, so one menu can serve many widgets
             kwargs: options to be passed on to the tk.Menu initializer
+            
+        Methods:
+        
+            add_submenu: alias for add_cascade
+            invalidate: call the provider again the next time the menu is posted
+            attach: make the menu pop up on a widget, by adding the bindtag to its bindtags
+            detach: remove the bindtag from a widget's bindtags
              
         Generates:
         
@@ -26,14 +36,43 @@ class PopupMenu(tk.Menu):
         """
         self._offx = kwargs.pop("offsetx", -2)
         self._offy = kwargs.pop("offsety", -2)
+        self._provider = kwargs.pop("provider", None)
+        self._version = kwargs.pop("version", None)
+        self._postcommand = kwargs.pop("postcommand", None)
+        self._bindtag = kwargs.pop("bindtag", None)
+        self._token = None
+        self._provided = []
+        self._callbacks = {}
+        self._commands = {}
+        self._stale = True
         tearoff = kwargs.pop("tearoff", False)
-        tk.Menu.__init__(self, tearoff=tearoff, **kwargs)
-        self._master = master or tk._default_root
+        tk.Menu.__init__(self, tearoff=tearoff, postcommand=self._post, **kwargs)
+        self._master = self.context = master or tk._default_root
+        self._bindings = []
+        self._bind()
+            
+    def _bind(self):
+        """Bind the popup to the bindtag, or to the master keeping its other bindings"""
         if self._master.tk.call("tk", "windowingsystem") == "aqua":
-            master.bind("<Button-2>", self._popup)
-            master.bind("<Control-1>", self._popup)
+            sequences = ("<Button-2>", "<Control-1>")
         else:
-            master.bind("<Button-3>", self._popup)
+            sequences = ("<Button-3>",)
+        for sequence in sequences:
+            if self._bindtag is None:
+                self._bindings.append((sequence, self._master.bind(sequence, self._popup, add="+")))
+            else:
+                self._bindings.append((sequence, self.bind_class(self._bindtag, sequence, self._popup, add="+")))
+                
+    def _unbind(self):
+        for sequence, funcid in self._bindings:
+            if self._bindtag is None:
+                self._master.unbind(sequence, funcid)
+            else:
+                script = self.bind_class(self._bindtag, sequence)
+                lines = [line for line in script.split("\n") if funcid not in line]
+                self.bind_class(self._bindtag, sequence, "\n".join(lines))
+                self.deletecommand(funcid)
+        self._bindings = []
             
     def __getitem__(self, key):
         return self.cget(key)
@@ -42,12 +81,84 @@ class PopupMenu(tk.Menu):
         self.configure(**{key: value})
 
     def _popup(self, event):
+        self.context = event.widget
         try:
             self.tk_popup(int(event.x_root + self._offx), int(event.y_root + self._offy))
-            self.event_generate("<<PopupMenuPopup>>")
+            self.event_generate("<<PopupMenuPopup>>", data=str(event.widget))
         finally:
             self.grab_release()
             
+    def _post(self):
+        """Bring the provided entries up to date, right before Tk posts the menu"""
+        if self._provider is not None:
+            self._populate(self.context)
+        if self._postcommand is not None:
+            self._postcommand()
+            
+    def _populate(self, widget):
+        """Call the provider if the version token changed, and apply only the differences"""
+        if self._version is not None:
+            token = (widget, self._version(widget))
+            if not self._stale and token == self._token:
+                return
+            self._token = token
+        entries = []
+        callbacks = {}
+        for entry in self._provider(widget):
+            entry = dict(entry)
+            kind = entry.pop("type", "command")
+            key = entry.pop("key", None)
+            if key is not None and callable(entry.get("command")):
+                # A fresh callback for the same key only replaces the Python side, the Tcl command is kept
+                callbacks[key] = entry["command"]
+                if key not in self._commands:
+                    self._commands[key] = lambda key=key: self._callbacks[key]()
+                entry["command"] = self._commands[key]
+            entries.append((kind, entry))
+        self._callbacks = callbacks
+        self._commands = {key: command for key, command in self._commands.items() if key in callbacks}
+        old = self._provided
+        end = self.index("end")
+        start = (-1 if end is None else end) + 1 - len(old)
+        for index, (kind, options) in enumerate(entries):
+            if index >= len(old):
+                self.add(kind, **options)
+            elif old[index][0] != kind or old[index][1].keys() - options.keys():
+                # Tk can't reset every option to its default, so replace the entry
+                self.delete(start + index)
+                self.insert(start + index, kind, **options)
+            elif old[index][1] != options:
+                changed = {key: value for key, value in options.items() if old[index][1].get(key) != value}
+                if "command" in changed:
+                    self._deletecommand(start + index)
+                self.entryconfigure(start + index, **changed)
+        if len(old) > len(entries):
+            self.delete(start + len(entries), start + len(old) - 1)
+        self._provided = entries
+        self._stale = False
+        
+    def _deletecommand(self, index):
+        """Unregister the Tcl command of an entry before it's replaced, tk.Menu only does this in delete"""
+        name = str(self.entrycget(index, "command"))
+        if name in (self._tclCommands or ()):
+            self.deletecommand(name)
+
+    def invalidate(self):
+        """Call the provider again the next time the menu is posted"""
+        self._stale = True
+        
+    def attach(self, *widgets):
+        """Make the menu pop up on the widgets, by adding the bindtag to their bindtags"""
+        for widget in widgets:
+            tags = widget.bindtags()
+            if self._bindtag not in tags:
+                widget.bindtags((tags[0], self._bindtag) + tags[1:])
+                
+    def detach(self, *widgets):
+        """Remove the bindtag from the widgets' bindtags"""
+        for widget in widgets:
+            widget.bindtags(tuple(tag for tag in widget.bindtags() if tag != self._bindtag))
+            
     def add_submenu(self, *args, **kwargs):
         """Alias for add_cascade"""
         self.add_cascade(*args, **kwargs)
@@ -56,7 +167,16 @@ class PopupMenu(tk.Menu):
         """Configure resources of the widget."""
         self._offx = kwargs.pop("offsetx", self._offx)
         self._offy = kwargs.pop("offsety", self._offy)
-        tk.Menu.configure(**kwargs)
+        if "provider" in kwargs or "version" in kwargs:
+            self._provider = kwargs.pop("provider", self._provider)
+            self._version = kwargs.pop("version", self._version)
+            self.invalidate()
+        self._postcommand = kwargs.pop("postcommand", self._postcommand)
+        if "bindtag" in kwargs:
+            self._unbind()
+            self._bindtag = kwargs.pop("bindtag")
+            self._bind()
+        tk.Menu.configure(self, **kwargs)
         
     config = configure
     
@@ -66,12 +186,20 @@ class PopupMenu(tk.Menu):
             return self._offx
         elif key == "offsety":
             return self._offy
+        elif key == "provider":
+            return self._provider
+        elif key == "version":
+            return self._version
+        elif key == "bindtag":
+            return self._bindtag
+        elif key == "postcommand":
+            return self._postcommand
         else:
-            return tk.Menu.cget(key)
+            return tk.Menu.cget(self, key)
     
     def keys(self):
         """Return a list of all resource names of this widget"""
-        keys = tk.Menu.keys()
-        keys.extend(["offsetx", "offsety"])
+        keys = tk.Menu.keys(self)
+        keys.extend(["offsetx", "offsety", "bindtag", "provider", "version"])
         keys.sort()
         return keys
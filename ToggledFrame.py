@@ -7,6 +7,8 @@ Copyright (c): 2021 rdbende
 # Based on RedFantom's ToggledFrame:
 # https://github.com/RedFantom/ttkwidgets/blob/master/ttkwidgets/frames/toggledframe.py
 
+from collections import OrderedDict
+from contextlib import contextmanager
 import tkinter as tk
 from tkinter import ttk as ttk
 
@@ -23,6 +25,10 @@ class ToggledFrame(ttk.Frame):
             width (int): the width of the expander button given in characters
             cursor (str): the expander button's cursor
             expanded (bool): determines whether the frame is expanded by default
+            content (callable): function creating the widgets inside the frame, called on the first expand
+            unload (int): destroy the widgets created by content after being collapsed for this time (in milliseconds)
+            save (callable): function returning the state of the widgets inside the frame, called before they're destroyed
+            restore (callable): function called with the frame and the saved state, after content recreated the widgets
             kwargs: kwargs: options to be passed on to the ttk.Frame initializer
             
         Generates:
@@ -43,6 +49,14 @@ class ToggledFrame(ttk.Frame):
         self._text = kwargs.pop("text", None)
         self._cursor = kwargs.pop("cursor", "arrow")
         self._width = kwargs.pop("width", 20)
+        self._content = kwargs.pop("content", None)
+        self._unload = kwargs.pop("unload", None)
+        self._save = kwargs.pop("save", None)
+        self._restore = kwargs.pop("restore", None)
+        self._loaded = False
+        self._saved = None
+        self._unload_id = None
+        self._group = None
         self._toggled = tk.BooleanVar(value=self._expanded)
         ttk.Frame.__init__(self, master, **kwargs)
         self._button = ttk.Checkbutton(self, style="Toolbutton", cursor=self._cursor,
@@ -62,31 +76,80 @@ class ToggledFrame(ttk.Frame):
 
     def toggle(self, *args):
         """Expand or collapse the frame"""
-        if self.state == "expanded":
+        self._set(self.state != "expanded")
+        
+    def _set(self, expanded):
+        """Expand or collapse the frame, if it isn't already, the events are deferred in a group batch"""
+        if expanded == (self.state == "expanded"):
+            self._toggled.set(expanded)
+            return
+        self._expanded = expanded
+        batched = self._group is not None and self._group._batching
+        if batched:
+            self._group._changed.setdefault(self, self.state)
+        if not expanded:
             self._toggled.set(False)
             self.frame.grid_forget()
             self.state = "collapsed"
-            self.event_generate("<<ToggledFrameCollapsed>>")
+            if self._loaded and self._unload is not None:
+                self._unload_id = self.after(self._unload, self._unload_content)
+            if not batched:
+                self.event_generate("<<ToggledFrameCollapsed>>")
         else:
+            self._load()
             self._toggled.set(True)
             self.frame.grid(row=1, column=0, sticky="nswe")
             self.state = "expanded"
-            self.event_generate("<<ToggledFrameExpanded>>")
-        self.event_generate("<<ToggledFrameToggled>>")
+            if not batched:
+                self.event_generate("<<ToggledFrameExpanded>>")
+        if not batched:
+            self.event_generate("<<ToggledFrameToggled>>")
+        
+    def _load(self):
+        """Create the content on the first expand, or after it was unloaded"""
+        if self._unload_id is not None:
+            self.after_cancel(self._unload_id)
+            self._unload_id = None
+        if self._content is None or self._loaded:
+            return
+        self._content(self.frame)
+        self._loaded = True
+        if self._saved is not None and self._restore is not None:
+            self._restore(self.frame, self._saved)
+        self._saved = None
+        
+    def _unload_content(self):
+        """Destroy the content of the collapsed frame, keeping its state if there's a save function"""
+        self._unload_id = None
+        if self._save is not None:
+            self._saved = self._save(self.frame)
+        for child in self.frame.winfo_children():
+            child.destroy()
+        self._loaded = False
+        
+    def destroy(self):
+        if self._unload_id is not None:
+            self.after_cancel(self._unload_id)
+            self._unload_id = None
+        ttk.Frame.destroy(self)
             
     def configure(self, **kwargs):
-        self._expanded = kwargs.pop("expanded", self._expanded)
-        self._text = kwargs.pop("text", self._text)
-        self._cursor = kwargs.pop("cursor", self._cursor)
-        self._width = kwargs.pop("width", self._width)
-        self._button.configure(text=self._text, cursor=self._cursor, width=self._width)
-        ttk.Frame.configure(self, **kwargs)
-        if self._expanded:
-            self.state = "collapsed"
-            self.toggle()
-        else:
-            self.state = "expanded"
-            self.toggle()
+        """Configure resources of the widget"""
+        expanded = kwargs.pop("expanded", None)
+        button = {key: kwargs.pop(key) for key in ("text", "cursor", "width") if key in kwargs}
+        self._text = button.get("text", self._text)
+        self._cursor = button.get("cursor", self._cursor)
+        self._width = button.get("width", self._width)
+        self._content = kwargs.pop("content", self._content)
+        self._unload = kwargs.pop("unload", self._unload)
+        self._save = kwargs.pop("save", self._save)
+        self._restore = kwargs.pop("restore", self._restore)
+        if button:
+            self._button.configure(**button)
+        if kwargs:
+            ttk.Frame.configure(self, **kwargs)
+        if expanded is not None:
+            self._set(bool(expanded))
         
     config = configure
             
@@ -94,20 +157,409 @@ class ToggledFrame(ttk.Frame):
         """Return the resource value for a KEY given as string"""
         if key == "cursor":
             return self._cursor
+        elif key == "content":
+            return self._content
         elif key == "expanded":
             return self._expanded
+        elif key == "restore":
+            return self._restore
+        elif key == "save":
+            return self._save
         elif key == "state":
             return self.state
         elif key == "text":
             return self._text
+        elif key == "unload":
+            return self._unload
         elif key == "width":
             return self._width
         else:
-            return ttk.Frame.cget(key)
+            return ttk.Frame.cget(self, key)
     
     def keys(self):
         """Return a list of all resource names of this widget"""
-        keys = ttk.Frame.keys()
-        keys.extend(["cursor", "text", "width"])
+        keys = ttk.Frame.keys(self)
+        keys.extend(["content", "cursor", "expanded", "restore", "save", "text", "unload", "width"])
+        keys.sort()
+        return keys
+
+
+class ToggledGroup:
+    """
+    A group of ToggledFrames that can be changed together, with one
+    <<ToggledGroupChanged>> event instead of three events per frame
+    """
+
+    def __init__(self, master, frames=()):
+        self.master = master
+        self.frames = []
+        self.changed = []
+        self._changed = OrderedDict()
+        self._batching = False
+        for frame in frames:
+            self.add(frame)
+
+    def add(self, frame):
+        """Add a ToggledFrame to the group"""
+        frame._group = self
+        self.frames.append(frame)
+
+    def remove(self, frame):
+        """Remove a ToggledFrame from the group"""
+        frame._group = None
+        self.frames.remove(frame)
+
+    @contextmanager
+    def batch(self):
+        """
+        Apply expand, collapse and configure calls on the frames of the group without
+        generating their events, then generate <<ToggledGroupChanged>> on the master
+        once if any frame was expanded or collapsed
+        """
+        if self._batching:
+            yield self
+            return
+        self._batching = True
+        self._changed.clear()
+        try:
+            yield self
+        finally:
+            self._batching = False
+            self.changed = [frame for frame, state in self._changed.items() if frame.state != state]
+            self._changed.clear()
+            if self.changed:
+                self.master.event_generate("<<ToggledGroupChanged>>")
+
+    def expand_all(self):
+        """Expand every frame of the group"""
+        with self.batch():
+            for frame in self.frames:
+                frame._set(True)
+
+    def collapse_all(self):
+        """Collapse every frame of the group"""
+        with self.batch():
+            for frame in self.frames:
+                frame._set(False)
+
+
+class _HeightIndex:
+    """Prefix sums of section heights in a Fenwick tree, updated and searched in O(log n)"""
+
+    def __init__(self):
+        self._tree = [0]
+        self._heights = []
+
+    def __len__(self):
+        return len(self._heights)
+
+    def append(self, height):
+        self._heights.append(height)
+        index = len(self._heights)
+        lowbit = index & -index
+        self._tree.append(height + self.prefix(index - 1) - self.prefix(index - lowbit))
+
+    def update(self, position, height):
+        """Change the height of the section at position"""
+        delta = height - self._heights[position]
+        self._heights[position] = height
+        index = position + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, count):
+        """Return the total height of the first count sections"""
+        total = 0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
+
+    def find(self, y):
+        """Return the position of the section containing y"""
+        position = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            if position + step < len(self._tree) and self._tree[position + step] <= y:
+                position += step
+                y -= self._tree[position]
+            step >>= 1
+        return min(position, len(self._heights) - 1)
+
+    def height(self, position):
+        return self._heights[position]
+
+
+class _Section:
+
+    __slots__ = ("text", "content", "expanded", "height", "saved")
+
+    def __init__(self, text, content, height):
+        self.text = text
+        self.content = content
+        self.expanded = False
+        self.height = height
+        self.saved = None
+
+
+class Accordion(tk.Canvas):
+    """A scrollable list of collapsible sections, that creates only the visible ones"""
+
+    def __init__(self, master=None, **kwargs):
+        """
+        Create an accordion
+
+        Options:
+
+            headerheight (int): the height of the section headers in pixels (default is 28)
+            bodyheight (int): the estimated height of an expanded section until it's shown (default is 150)
+            maxexpanded (int): collapse the least recently expanded section when more are expanded (default is None, no limit)
+            maxbodies (int): the number of offscreen section contents kept alive (default is 16)
+            save (callable): function returning the state of a section's frame, called before it's destroyed
+            restore (callable): function called with a section's frame and its saved state, after it was created again
+            kwargs: options to be passed on to the tk.Canvas initializer
+
+        Methods:
+
+            add: add a section with a text and a content function, called with the frame of the section
+            toggle / expand / collapse: expand or collapse a section
+            see: scroll to a section
+
+        Generates:
+
+            virtual event: <<AccordionToggled>>, the section is in the toggled attribute
+        """
+        self._headerheight = int(kwargs.pop("headerheight", 28))
+        self._bodyheight = int(kwargs.pop("bodyheight", 150))
+        self._maxexpanded = kwargs.pop("maxexpanded", None)
+        self._maxbodies = int(kwargs.pop("maxbodies", 16))
+        self._save = kwargs.pop("save", None)
+        self._restore = kwargs.pop("restore", None)
+        kwargs.setdefault("highlightthickness", 0)
+        tk.Canvas.__init__(self, master, **kwargs)
+        self._sections = []
+        self._index = _HeightIndex()
+        self._expanded = OrderedDict()
+        self._pool = []
+        self._free = []
+        self._headers = {}
+        self._bodies = OrderedDict()
+        self._after = None
+        self.toggled = None
+        self.bind("<Configure>", self._resize, add=True)
+
+    def __getitem__(self, key):
+        return self.cget(key)
+
+    def __setitem__(self, key, value):
+        self.configure(**{key: value})
+
+    def __len__(self):
+        return len(self._sections)
+
+    def add(self, text, content=None, expanded=False):
+        """Add a section, content is called with the frame of the section when it's first shown"""
+        self._sections.append(_Section(text, content, self._bodyheight))
+        self._index.append(self._headerheight)
+        position = len(self._sections) - 1
+        if expanded:
+            self.expand(position)
+        self._schedule()
+        return position
+
+    def toggle(self, position):
+        """Expand or collapse a section"""
+        if self._sections[position].expanded:
+            self.collapse(position)
+        else:
+            self.expand(position)
+
+    def expand(self, position):
+        section = self._sections[position]
+        if section.expanded:
+            return
+        section.expanded = True
+        self._expanded[position] = None
+        self._index.update(position, self._headerheight + section.height)
+        if self._maxexpanded is not None:
+            while len(self._expanded) > self._maxexpanded:
+                self.collapse(next(iter(self._expanded)))
+        self._toggled(position)
+
+    def collapse(self, position):
+        section = self._sections[position]
+        if not section.expanded:
+            return
+        section.expanded = False
+        self._expanded.pop(position, None)
+        self._index.update(position, self._headerheight)
+        self._toggled(position)
+
+    def _toggled(self, position):
+        self.toggled = position
+        self._schedule()
+        self.event_generate("<<AccordionToggled>>")
+
+    def see(self, position):
+        """Scroll the view so that the section at position is at the top"""
+        self.yview_moveto(self._index.prefix(position) / max(1, self._index.prefix(len(self._index))))
+
+    def _schedule(self, *args):
+        if self._after is None:
+            self._after = self.after_idle(self._update)
+
+    def _resize(self, event):
+        for header, variable, item in self._pool:
+            self.itemconfigure(item, width=event.width)
+        for frame, item in self._bodies.values():
+            self.itemconfigure(item, width=event.width)
+        self._schedule()
+
+    def _clicked(self, header):
+        for position, (shown, variable, item) in self._headers.items():
+            if shown is header:
+                self.toggle(position)
+                variable.set(self._sections[position].expanded)
+                return
+
+    def _header(self):
+        """Return a header from the pool, creating one if they're all shown"""
+        if self._free:
+            return self._free.pop()
+        variable = tk.BooleanVar(self)
+        header = ttk.Checkbutton(self, style="Toolbutton", variable=variable)
+        header.configure(command=lambda: self._clicked(header))
+        item = self.create_window(0, 0, window=header, anchor="nw", width=self.winfo_width(), height=self._headerheight)
+        entry = (header, variable, item)
+        self._pool.append(entry)
+        return entry
+
+    def _body(self, position):
+        """Return the frame of an expanded section, creating its content if it isn't alive"""
+        if position in self._bodies:
+            self._bodies.move_to_end(position)
+            return self._bodies[position]
+        section = self._sections[position]
+        frame = ttk.Frame(self)
+        if section.content is not None:
+            section.content(frame)
+            if section.saved is not None and self._restore is not None:
+                self._restore(frame, section.saved)
+            section.saved = None
+        frame.bind("<Configure>", lambda event: self._measure(position, event.height), add=True)
+        item = self.create_window(0, 0, window=frame, anchor="nw", width=self.winfo_width())
+        self._bodies[position] = (frame, item)
+        return self._bodies[position]
+
+    def _measure(self, position, height):
+        """Update the height index once the real height of a section's content is known"""
+        section = self._sections[position]
+        if height > 1 and height != section.height:
+            section.height = height
+            if section.expanded:
+                self._index.update(position, self._headerheight + height)
+                self._schedule()
+
+    def _update(self):
+        """Show the headers and contents of the sections intersecting the viewport"""
+        self._after = None
+        total = self._index.prefix(len(self._index))
+        tk.Canvas.configure(self, scrollregion=(0, 0, self.winfo_width(), total))
+        visible = []
+        if self._sections:
+            top = self.canvasy(0)
+            bottom = self.canvasy(self.winfo_height())
+            position = self._index.find(max(0, top))
+            y = self._index.prefix(position)
+            while position < len(self._sections) and y < bottom:
+                visible.append((position, y))
+                y += self._index.height(position)
+                position += 1
+        shown = {position for position, y in visible}
+        for position in [position for position in self._headers if position not in shown]:
+            entry = self._headers.pop(position)
+            self.itemconfigure(entry[2], state="hidden")
+            self._free.append(entry)
+        for position, y in visible:
+            section = self._sections[position]
+            if position not in self._headers:
+                self._headers[position] = self._header()
+            header, variable, item = self._headers[position]
+            header.configure(text=section.text)
+            variable.set(section.expanded)
+            self.coords(item, 0, y)
+            self.itemconfigure(item, state="normal")
+            if section.expanded:
+                frame, body = self._body(position)
+                self.coords(body, 0, y + self._headerheight)
+                self.itemconfigure(body, state="normal")
+        for position, (frame, body) in self._bodies.items():
+            if position not in shown or not self._sections[position].expanded:
+                self.itemconfigure(body, state="hidden")
+        limit = max(self._maxbodies, len(shown))
+        for position in list(self._bodies):
+            if len(self._bodies) <= limit:
+                break
+            if position in shown and self._sections[position].expanded:
+                continue
+            frame, body = self._bodies.pop(position)
+            if self._save is not None:
+                self._sections[position].saved = self._save(frame)
+            self.delete(body)
+            frame.destroy()
+
+    def yview(self, *args):
+        """Query and change the vertical position of the view"""
+        result = tk.Canvas.yview(self, *args)
+        if args:
+            self._schedule()
+        return result
+
+    def yview_moveto(self, fraction):
+        self.yview("moveto", fraction)
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
+
+    def configure(self, **kwargs):
+        """Configure resources of the widget"""
+        self._maxexpanded = kwargs.pop("maxexpanded", self._maxexpanded)
+        self._maxbodies = int(kwargs.pop("maxbodies", self._maxbodies))
+        self._save = kwargs.pop("save", self._save)
+        self._restore = kwargs.pop("restore", self._restore)
+        self._bodyheight = int(kwargs.pop("bodyheight", self._bodyheight))
+        if "headerheight" in kwargs:
+            self._headerheight = int(kwargs.pop("headerheight"))
+            for position, section in enumerate(self._sections):
+                self._index.update(position, self._headerheight + (section.height if section.expanded else 0))
+            for header, variable, item in self._pool:
+                self.itemconfigure(item, height=self._headerheight)
+        tk.Canvas.configure(self, **kwargs)
+        self._schedule()
+
+    config = configure
+
+    def cget(self, key):
+        """Return the resource value for a KEY given as string"""
+        if key == "bodyheight":
+            return self._bodyheight
+        elif key == "headerheight":
+            return self._headerheight
+        elif key == "maxbodies":
+            return self._maxbodies
+        elif key == "maxexpanded":
+            return self._maxexpanded
+        elif key == "restore":
+            return self._restore
+        elif key == "save":
+            return self._save
+        else:
+            return tk.Canvas.cget(self, key)
+
+    def keys(self):
+        """Return a list of all resource names of this widget"""
+        keys = tk.Canvas.keys(self)
+        keys.extend(["bodyheight", "headerheight", "maxbodies", "maxexpanded", "restore", "save"])
         keys.sort()
         return keys
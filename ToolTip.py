@@ -5,10 +5,137 @@ Copyright (c): 2021 rdbende
 """
 
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+
+class _ToolTipPool:
+    """Process-wide pool of withdrawn tooltip windows, shared by every ToolTip"""
+
+    maxsize = 4
+
+    def __init__(self):
+        self._idle = {}
+
+    def acquire(self, master):
+        """Return an idle (toplevel, label) pair for the root of master, or create one"""
+        root = master._root()
+        idle = self._idle.setdefault(root, [])
+        while idle:
+            window = idle.pop()
+            if window.toplevel.winfo_exists():
+                return window
+        return _ToolTipWindow(root)
+
+    def release(self, window):
+        """Withdraw the window and keep it for later reuse if the pool isn't full"""
+        try:
+            window.toplevel.withdraw()
+        except tk.TclError:
+            return
+        idle = self._idle.setdefault(window.toplevel._root(), [])
+        if len(idle) < self.maxsize:
+            idle.append(window)
+        else:
+            window.toplevel.destroy()
+
+
+class _ToolTipWindow:
+    """A reusable tooltip Toplevel with its Label"""
+
+    def __init__(self, root):
+        self.toplevel = tk.Toplevel(root)
+        self.toplevel.overrideredirect(True)
+        self.toplevel.withdraw()
+        self.label = tk.Label(self.toplevel)
+        self.label.pack()
+        self._defaults = {}
+        self._options = ()
+
+    def configure(self, ipadx, ipady, **kwargs):
+        """Reconfigure the label, resetting the options the previous tooltip set"""
+        options = {}
+        for key in self._options:
+            if key not in kwargs:
+                if key not in self._defaults:
+                    self._defaults[key] = self.label.configure(key)[3]
+                options[key] = self._defaults[key]
+        options.update(kwargs)
+        self.label.configure(**options)
+        self.label.pack_configure(ipadx=ipadx, ipady=ipady)
+        self._options = tuple(kwargs)
+
+
+class _ToolTipCache:
+    """Thread-safe LRU cache for the results of tooltip text providers"""
+
+    maxsize = 256
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get(self, key, ttl=None):
+        """Return the cached text for key, or None if it's missing or older than ttl seconds"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if ttl is not None and time.monotonic() - item[0] > ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key, text):
+        """Store text for key, and evict the least recently used items"""
+        with self._lock:
+            self._items[key] = (time.monotonic(), text)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def submit(self, key, provider):
+        """Run provider in the worker pool, sharing one future between the requests of the same key"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ToolTip")
+            future = self._executor.submit(provider)
+            self._pending[key] = future
+        # Outside the lock, a future that is already done runs the callback right away
+        future.add_done_callback(lambda future: self._done(key, future))
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        if not future.cancelled() and future.exception() is None:
+            self.put(key, str(future.result()))
+
+
+_pool = _ToolTipPool()
+_cache = _ToolTipCache()
+
 
 class ToolTip:
     """Popup help for Tkinter widgets"""
 
+    __slots__ = ("master", "_text", "_wait", "_duration", "_direction", "_relief", "_bd",
+                 "_ipadx", "_ipady", "_registry", "_threaded", "_placeholder", "_cachekey", "_ttl",
+                 "kwargs", "_window", "_toplevel", "label", "id0", "id1", "id2", "x", "y")
+
+    _bindtag = "ToolTip"
+    _registered = {}
+    _bound_interps = set()
+
     def __init__(self, master, **kwargs):
         """
         Create a ToolTip
@@ -20,9 +147,16 @@ class ToolTip:
             direction: (str) direction relative to the parent. Directions: cursor, above, below, right, left (default is cursor)
             ipadx: (int) inner X padding of the tooltip
             ipady: (int) inner Y padding of the tooltip
+            registry: (bool) use the shared ToolTip bindtag instead of binding on the widget itself (default is False)
+            text: (str or callable) the tooltip text, or a function returning it, called only when the tooltip appears
+            threaded: (bool) call the text function in a worker thread, and show the placeholder meanwhile (default is False)
+            placeholder: (str) text shown while a threaded text function is running (default is ...)
+            cachekey: (hashable) key of the cached text function result (default is the function itself)
+            cachettl: (float) seconds after the cached text function result expires (default is None, never)
             kwargs: options to be passed on to the tk.Label initializer inside the tooltip
         """
         self.master = master
+        self._registry = kwargs.pop("registry", False)
         self._text = kwargs.pop("text", None)
         self._wait = int(kwargs.pop("wait", 1000))
         self._duration = int(kwargs.pop("duration", 8000))
@@ -31,36 +165,155 @@ class ToolTip:
         self._bd = kwargs.pop("borderwidth", "1")
         self._ipadx = kwargs.pop("ipadx", "2")
         self._ipady = kwargs.pop("ipady", "1")
+        self._threaded = kwargs.pop("threaded", False)
+        self._placeholder = kwargs.pop("placeholder", "...")
+        self._cachekey = kwargs.pop("cachekey", None)
+        self._ttl = kwargs.pop("cachettl", None)
         self.kwargs = kwargs
-        if self._text is not None:
-            self.master.bind("<Enter>", self._enter)
-            self.master.bind("<Leave>", self._hidetip)
-            self.master.bind("<ButtonPress>", self._hidetip)
+        self._window = None
+        self.id0 = None
+        self.id1 = None
+        self.id2 = None
+        self._bind()
         
     def __getitem__(self, key):
         return self.cget(key)
 
     def __setitem__(self, key, value):
         self.configure(**{key: value})
+
+    def _bind(self):
+        """Bind the tooltip to its master, either directly or through the shared bindtag"""
+        if self._registry:
+            key = (self.master.tk, str(self.master))
+            if key not in ToolTip._registered:
+                ToolTip._install_bindtag(self.master)
+                tags = self.master.bindtags()
+                if ToolTip._bindtag not in tags:
+                    self.master.bindtags((ToolTip._bindtag,) + tags)
+            ToolTip._registered[key] = self
+        elif self._text is not None:
+            self.master.bind("<Enter>", self._enter)
+            self.master.bind("<Leave>", self._hidetip)
+            self.master.bind("<ButtonPress>", self._hidetip)
+
+    def _unbind(self):
+        """Undo _bind, before switching between the shared bindtag and direct bindings"""
+        if self._registry:
+            key = (self.master.tk, str(self.master))
+            if ToolTip._registered.get(key) is self:
+                del ToolTip._registered[key]
+                self.master.bindtags(tuple(tag for tag in self.master.bindtags() if tag != ToolTip._bindtag))
+        else:
+            for sequence in ("<Enter>", "<Leave>", "<ButtonPress>"):
+                self.master.unbind(sequence)
+
+    @staticmethod
+    def _install_bindtag(widget):
+        """Create the class bindings of the shared bindtag, once per Tcl interpreter"""
+        if widget.tk in ToolTip._bound_interps:
+            return
+        root = widget._root()
+        root.bind_class(ToolTip._bindtag, "<Enter>", ToolTip._dispatch_enter)
+        root.bind_class(ToolTip._bindtag, "<Leave>", ToolTip._dispatch_hide)
+        root.bind_class(ToolTip._bindtag, "<ButtonPress>", ToolTip._dispatch_hide)
+        root.bind_class(ToolTip._bindtag, "<Destroy>", ToolTip._dispatch_destroy)
+        ToolTip._bound_interps.add(widget.tk)
+
+    @staticmethod
+    def _lookup(event):
+        """Return the registered ToolTip of the event's widget"""
+        widget = event.widget
+        if isinstance(widget, str):
+            return None
+        return ToolTip._registered.get((widget.tk, str(widget)))
+
+    @staticmethod
+    def _dispatch_enter(event):
+        tooltip = ToolTip._lookup(event)
+        if tooltip is not None and tooltip._text is not None:
+            tooltip._enter()
+
+    @staticmethod
+    def _dispatch_hide(event):
+        tooltip = ToolTip._lookup(event)
+        if tooltip is not None:
+            tooltip._hidetip()
+
+    @staticmethod
+    def _dispatch_destroy(event):
+        tooltip = ToolTip._lookup(event)
+        if tooltip is not None:
+            tooltip._hidetip()
+            del ToolTip._registered[(event.widget.tk, str(event.widget))]
         
     def _enter(self, *args):
-        """Initialize the :class:`tk.Toplevel`"""
-        self._toplevel = tk.Toplevel(self.master)
-        self._toplevel.overrideredirect(True)
-        self._toplevel.withdraw()
+        """Schedule the tooltip"""
+        self._hidetip()
         self.id0 = self.master.after(self._wait, self._showtip)
         
     def _hidetip(self, *args):
-        """Destroy the tooltip"""
-        self.master.after_cancel(self.id0)
-        self.master.after_cancel(self.id1)
-        self._toplevel.destroy()
+        """Hide the tooltip, and give its window back to the pool"""
+        if self.id0 is not None:
+            self.master.after_cancel(self.id0)
+            self.id0 = None
+        if self.id1 is not None:
+            self.master.after_cancel(self.id1)
+            self.id1 = None
+        if self.id2 is not None:
+            self.master.after_cancel(self.id2)
+            self.id2 = None
+        if self._window is not None:
+            _pool.release(self._window)
+            self._window = None
+
+    def _gettext(self):
+        """Return the text to display, calling the text function if it isn't cached"""
+        if not callable(self._text):
+            return self._text
+        key = self._text if self._cachekey is None else self._cachekey
+        text = _cache.get(key, self._ttl)
+        if text is not None:
+            return text
+        if self._threaded:
+            future = _cache.submit(key, self._text)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                return future.result()
+            # Polled from the mainloop, so the placeholder is shown before the result can replace it
+            self.id2 = self.master.after(20, self._poll, future)
+            return self._placeholder
+        text = str(self._text())
+        _cache.put(key, text)
+        return text
+
+    def _poll(self, future):
+        """Swap in the result of a threaded text function once it's ready"""
+        if not future.done():
+            self.id2 = self.master.after(20, self._poll, future)
+            return
+        self.id2 = None
+        if future.exception() is not None:
+            self._hidetip()
+            return
+        text = future.result()
+        if self._window is not None:
+            self.label.configure(text=text)
+            self._place()
 
     def _showtip(self):
-        """Display the tooltip"""        
+        """Display the tooltip"""
+        self.id0 = None
+        self._window = _pool.acquire(self.master)
+        self._toplevel = self._window.toplevel
+        self.label = self._window.label
+        self._window.configure(self._ipadx, self._ipady, text=self._gettext(), relief=self._relief, borderwidth=self._bd, **self.kwargs)
+        self._place()
         self._toplevel.deiconify()
-        self.label = tk.Label(self._toplevel, text=self._text, relief=self._relief, borderwidth=self._bd, **self.kwargs)
-        self.label.pack(ipadx=self._ipadx, ipady=self._ipady)
+        self.id1 = self.master.after(self._duration, self._hidetip)
+        self._toplevel.update_idletasks()
+
+    def _place(self):
+        """Position the tooltip relative to its master"""
         if self._direction == "above":
             self.x = int(self.master.winfo_rootx() + (self.master.winfo_width() / 2) - (self.label.winfo_reqwidth() / 2))
             self.y = self.master.winfo_rooty() - self.label.winfo_reqheight() - 5
@@ -79,8 +332,6 @@ class ToolTip:
         else:
             raise ValueError("'direction' must be one of 'above, below, right, left, cursor'")
         self._toplevel.geometry("+{}+{}".format(self.x, self.y))
-        self.id1 = self.master.after(self._duration, self._hidetip)
-        self._toplevel.update_idletasks()
         
     def configure(self, **kwargs):
         """Configure resources of the widget."""
@@ -92,11 +343,17 @@ class ToolTip:
         self._bd = kwargs.pop("borderwidth", self._bd)
         self._ipadx = kwargs.pop("ipadx", self._ipadx)
         self._ipady = kwargs.pop("ipady", self._ipady)
+        registry = kwargs.pop("registry", self._registry)
+        if registry != self._registry:
+            self._hidetip()
+            self._unbind()
+            self._registry = registry
+        self._threaded = kwargs.pop("threaded", self._threaded)
+        self._placeholder = kwargs.pop("placeholder", self._placeholder)
+        self._cachekey = kwargs.pop("cachekey", self._cachekey)
+        self._ttl = kwargs.pop("cachettl", self._ttl)
         self.kwargs = kwargs
-        if self._text is not None:
-            self.master.bind("<Enter>", self._enter)
-            self.master.bind("<Leave>", self._hidetip)
-            self.master.bind("<ButtonPress>", self._hidetip)
+        self._bind()
         
     config = configure
     
@@ -118,6 +375,16 @@ class ToolTip:
             return self._relief
         elif key == "borderwidth":
             return self._bd
+        elif key == "registry":
+            return self._registry
+        elif key == "threaded":
+            return self._threaded
+        elif key == "placeholder":
+            return self._placeholder
+        elif key == "cachekey":
+            return self._cachekey
+        elif key == "cachettl":
+            return self._ttl
         else:
             return self.kwargs.get(key)
     
@@ -125,6 +392,6 @@ class ToolTip:
         """Return a list of all resource names of this widget"""
         label = tk.Label()
         keys = label.keys()
-        keys.extend(["wait", "duration", "direction", "ipadx", "ipady"])
+        keys.extend(["wait", "duration", "direction", "ipadx", "ipady", "registry", "threaded", "placeholder", "cachekey", "cachettl"])
         keys.sort()
         return keys
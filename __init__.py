@@ -8,10 +8,50 @@ Copyright (c): 2021 rdbende
 Source: https://github.com/rdbende/Tkinter-extension-widgets
 """
 
-from .ToolTip import ToolTip
-from .NumberEntry import NumberEntry
-from .tkImage import Image
-from .PopupMenu import PopupMenu
-from .MenuBar import MenuBar
-from .LinkLabel import LinkLabel # Based on RedFantom's LinkLabel
-from .ToggledFrame import ToggledFrame # Based on RedFantom's ToggledFrame
+import importlib
+import sys
+import types
+
+# The widgets are imported when they're first used, so importing one of them
+# doesn't load the modules (and dependencies) of the others
+_modules = {
+    "ToolTip": "ToolTip",
+    "NumberEntry": "NumberEntry",
+    "Sheet": "NumberEntry",
+    "Image": "tkImage",
+    "TiledImage": "tkImage",
+    "PopupMenu": "PopupMenu",
+    "MenuBar": "MenuBar",
+    "CommandIndex": "MenuBar",
+    "LinkLabel": "LinkLabel", # Based on RedFantom's LinkLabel
+    "ToggledFrame": "ToggledFrame", # Based on RedFantom's ToggledFrame
+    "ToggledGroup": "ToggledFrame",
+    "Accordion": "ToggledFrame",
+}
+
+__all__ = list(_modules)
+
+
+class _Package(types.ModuleType):
+
+    def __setattr__(self, name, value):
+        # The import system binds a submodule to the package after loading it,
+        # however it was imported, keep the widget of the same name instead
+        if isinstance(value, types.ModuleType) and _modules.get(name) == name and value.__name__ == __name__ + "." + name:
+            value = getattr(value, name)
+        types.ModuleType.__setattr__(self, name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __getattr__(name):
+    if name not in _modules:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _modules[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_modules))
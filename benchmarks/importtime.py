@@ -0,0 +1,69 @@
+"""
+Import time of each widget, measured with python -X importtime
+
+Every widget is imported in a fresh interpreter. The script fails if importing
+a widget loads the modules of other widgets, or optional and heavy dependencies
+that should only be imported when they're used, or if it's slower than --max-ms.
+
+    python benchmarks/importtime.py [--max-ms 50]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+package = os.path.basename(root)
+
+widgets = ["ToolTip", "NumberEntry", "Sheet", "Image", "TiledImage", "PopupMenu", "MenuBar",
+           "CommandIndex", "LinkLabel", "ToggledFrame", "ToggledGroup", "Accordion"]
+
+# Imported only when a feature needs them
+deferred = {"webbrowser", "numpy", "PIL"}
+
+
+def measure(name):
+    """Return the time spent importing the widget in microseconds, and the modules it imported"""
+    statement = "import tkinter; from {} import {}".format(package, name)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=os.path.dirname(root),
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total = 0
+    imported = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        if imported is not None:
+            imported.append(module.strip())
+            total += int(own)
+        elif module == " tkinter":
+            # A module is listed after the modules it imports, so everything
+            # listed after tkinter is imported by the package
+            imported = []
+    return total, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if a widget takes longer to import")
+    args = parser.parse_args()
+    failed = False
+    for name in widgets:
+        total, imported = measure(name)
+        problems = []
+        widget_modules = {module.split(".", 1)[1] for module in imported if module.startswith(package + ".")}
+        if len(widget_modules) > 1:
+            problems.append("loads " + ", ".join(sorted(widget_modules)))
+        loaded = deferred & {module.split(".")[0] for module in imported}
+        if loaded:
+            problems.append("imports " + ", ".join(sorted(loaded)))
+        if args.max_ms is not None and total / 1000 > args.max_ms:
+            problems.append("slower than {} ms".format(args.max_ms))
+        failed = failed or bool(problems)
+        print("{:<14}{:>8.1f} ms  {}".format(name, total / 1000, "; ".join(problems) or "ok"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+MenuBar benchmark, it needs a display
+
+Create a menubar of many menus with many commands each, one add_command call
+per entry, and with MenuBar.build from a spec, which adds every entry in one
+Tcl evaluation
+
+    python benchmarks/menubar.py [--menus 20] [--commands 200] [--rounds 5]
+"""
+
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import time
+import tkinter as tk
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(root_dir))
+MenuBar = importlib.import_module(os.path.basename(root_dir)).MenuBar
+
+
+def callback():
+    pass
+
+
+def imperative(window, args):
+    menubar = MenuBar(window)
+    for menu in range(args.menus):
+        submenu = tk.Menu(menubar)
+        menubar.add_submenu(menu=submenu, label="Menu {}".format(menu))
+        for command in range(args.commands):
+            if command % 10 == 9:
+                submenu.add_separator()
+            submenu.add_command(label="Command {}".format(command), command=callback, accelerator="Ctrl+{}".format(command % 10))
+    return menubar
+
+
+def declarative(window, args):
+    menubar = MenuBar(window)
+    spec = []
+    for menu in range(args.menus):
+        entries = []
+        for command in range(args.commands):
+            if command % 10 == 9:
+                entries.append("-")
+            entries.append({"label": "Command {}".format(command), "command": callback, "accelerator": "Ctrl+{}".format(command % 10)})
+        spec.append({"label": "Menu {}".format(menu), "menu": entries})
+    menubar.build(spec)
+    return menubar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--menus", type=int, default=20)
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    try:
+        root = tk.Tk()
+    except tk.TclError as error:
+        print("can't run without a display: {}".format(error))
+        return 1
+    print("{} menus of {} commands, {} rounds".format(args.menus, args.commands, args.rounds))
+    for name, function in (("add_command", imperative), ("build", declarative)):
+        times = []
+        for _ in range(args.rounds):
+            window = tk.Toplevel(root)
+            start = time.perf_counter()
+            function(window, args)
+            window.update_idletasks()
+            times.append((time.perf_counter() - start) * 1000)
+            window.destroy()
+        print("{:<12} median {:8.2f} ms  min {:8.2f} ms".format(name, statistics.median(times), min(times)))
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Image.scaled benchmark, it needs a display
+
+Sweep an image through many scale factors, like dragging a zoom slider, with an
+integer subsample per step, with scaled() without Pillow (zoom, then subsample)
+and with scaled() resizing with Pillow. Every step is a new factor, so none of
+them are served from the cache of recent scales
+
+    python benchmarks/scaled.py [--size 2000x1500] [--steps 50] [--alpha]
+"""
+
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(root_dir))
+package = importlib.import_module(os.path.basename(root_dir))
+tkImage = importlib.import_module(os.path.basename(root_dir) + ".tkImage")
+
+
+def write_image(directory, width, height, alpha):
+    """Write a noise image, as PPM or as PNG with an alpha channel"""
+    channels = 4 if alpha else 3
+    pixels = os.urandom(width * height * channels)
+    data, format = tkImage._encode_pixels(pixels, width, height, channels)
+    path = os.path.join(directory, "noise." + format)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def subsample(image, factor):
+    return image.subsample(max(1, round(1 / factor)))
+
+
+def scaled(image, factor):
+    return image.scaled(factor)
+
+
+def sweep(image, function, factors):
+    image._reset_scales()
+    times = []
+    for factor in factors:
+        start = time.perf_counter()
+        function(image, factor)
+        image.update_idletasks()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="2000x1500")
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--alpha", action="store_true", help="use an image with an alpha channel")
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.split("x"))
+    try:
+        root = tk.Tk()
+    except tk.TclError as error:
+        print("can't run without a display: {}".format(error))
+        return 1
+    factors = [0.3 + 0.69 * step / args.steps for step in range(args.steps)]
+    pillow = tkImage._import("PIL.Image")
+    with tempfile.TemporaryDirectory() as directory:
+        image = package.Image(root, file=write_image(directory, width, height, args.alpha), cache=False)
+        print("{}x{}{}, {} steps from 0.3 to 0.99".format(width, height, " with alpha" if args.alpha else "", args.steps))
+        runs = [("subsample", subsample, None), ("zoom/subsample", scaled, None)]
+        if pillow is not None:
+            runs.append(("Pillow", scaled, pillow))
+        else:
+            print("Pillow isn't installed, skipping the Pillow run")
+        for name, function, module in runs:
+            tkImage._optional["PIL.Image"] = module
+            times = sweep(image, function, factors)
+            print("{:<15} median {:8.2f} ms  max {:8.2f} ms  total {:9.1f} ms".format(name, statistics.median(times), max(times), sum(times)))
+        tkImage._optional["PIL.Image"] = pillow
+        image.destroy()
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+ToolTip benchmarks, they need a display
+
+hover: show and hide the tooltips of many widgets one after the other, like a mouse
+sweeping over a toolbar, with the pooled tooltip windows and with a Toplevel created
+and destroyed on every hover, like ToolTip did before the pool
+
+create: attach tooltips to many widgets with direct bindings and with the shared
+registry bindtag, and compare the time, the Python memory and the Tcl commands
+they take
+
+    python benchmarks/tooltip.py [hover|create] [--widgets 500] [--rounds 3]
+"""
+
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import time
+import tkinter as tk
+import tracemalloc
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(root_dir))
+ToolTip = importlib.import_module(os.path.basename(root_dir)).ToolTip
+
+
+class LegacyToolTip:
+    """The hover path of ToolTip before the window pool: a new Toplevel and Label per hover"""
+
+    def __init__(self, master, text):
+        self.master = master
+        self._text = text
+
+    def _enter(self):
+        self._toplevel = tk.Toplevel(self.master)
+        self._toplevel.overrideredirect(True)
+        self._toplevel.withdraw()
+
+    def _showtip(self):
+        self._toplevel.deiconify()
+        self.label = tk.Label(self._toplevel, text=self._text, relief="solid", borderwidth=1)
+        self.label.pack(ipadx=2, ipady=1)
+        x = int(self.master.winfo_rootx() + (self.master.winfo_width() / 2) - (self.label.winfo_reqwidth() / 2))
+        y = self.master.winfo_rooty() + self.master.winfo_reqheight() + 5
+        self._toplevel.geometry("+{}+{}".format(x, y))
+        self._toplevel.update_idletasks()
+
+    def _hidetip(self):
+        self._toplevel.destroy()
+
+
+def sweep(root, tooltips):
+    """Hover every widget once, return the time of each hover in milliseconds"""
+    times = []
+    for tooltip in tooltips:
+        start = time.perf_counter()
+        tooltip._enter()
+        tooltip._showtip()
+        root.update_idletasks()
+        tooltip._hidetip()
+        root.update_idletasks()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def report(name, times):
+    times = sorted(times)
+    print("{:<10} mean {:7.3f} ms  median {:7.3f} ms  p95 {:7.3f} ms".format(
+        name, statistics.mean(times), statistics.median(times), times[int(len(times) * 0.95)]))
+
+
+def hover(root, args):
+    print("hover sweep over {} widgets, {} rounds".format(args.widgets, args.rounds))
+    frame = tk.Frame(root)
+    frame.pack()
+    buttons = [tk.Button(frame, text=str(index)) for index in range(args.widgets)]
+    for index, button in enumerate(buttons):
+        button.grid(row=index // 25, column=index % 25)
+    root.update()
+    legacy = [LegacyToolTip(button, "Tooltip {}".format(index)) for index, button in enumerate(buttons)]
+    pooled = [ToolTip(button, text="Tooltip {}".format(index), direction="below") for index, button in enumerate(buttons)]
+    for name, tooltips in (("legacy", legacy), ("pooled", pooled)):
+        sweep(root, tooltips[:10])
+        report(name, [value for _ in range(args.rounds) for value in sweep(root, tooltips)])
+    frame.destroy()
+
+
+def create(root, args):
+    print("creating {} tooltips".format(args.widgets))
+    for registry in (False, True):
+        frame = tk.Frame(root)
+        labels = [tk.Label(frame, text=str(index)) for index in range(args.widgets)]
+        commands = len(root.tk.splitlist(root.tk.call("info", "commands")))
+        tracemalloc.start()
+        start = time.perf_counter()
+        tooltips = [ToolTip(label, text="Tooltip {}".format(index), registry=registry) for index, label in enumerate(labels)]
+        elapsed = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        commands = len(root.tk.splitlist(root.tk.call("info", "commands"))) - commands
+        print("{:<10} {:8.2f} ms  {:8.1f} KiB Python memory  {:6d} Tcl commands".format(
+            "registry" if registry else "direct", elapsed * 1000, memory / 1024, commands))
+        del tooltips
+        frame.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*", metavar="hover|create")
+    parser.add_argument("--widgets", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    args.benchmarks = args.benchmarks or ["hover", "create"]
+    for benchmark in args.benchmarks:
+        if benchmark not in ("hover", "create"):
+            parser.error("unknown benchmark {!r}".format(benchmark))
+    try:
+        root = tk.Tk()
+    except tk.TclError as error:
+        print("can't run without a display: {}".format(error))
+        return 1
+    for benchmark in args.benchmarks:
+        globals()[benchmark](root, args)
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
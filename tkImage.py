@@ -5,10 +5,463 @@ Copyright (c): 2021 rdbende
 """
 
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from fractions import Fraction
+import base64
+import binascii
+import bisect
+import hashlib
+import importlib
+import io
+import itertools
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+_optional = {}
+
+
+def _import(name):
+    """Import an optional dependency when it's first needed, return None if it isn't installed"""
+    if name not in _optional:
+        try:
+            _optional[name] = importlib.import_module(name)
+        except ImportError:
+            _optional[name] = None
+    return _optional[name]
+
+
+_executor = None
+
+
+def _submit(function, *args):
+    """Run function in the shared worker threads"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="Image")
+    return _executor.submit(function, *args)
+
+
+def _decode(file, data):
+    """
+    Read an image in a worker thread, and if Pillow is available, decode it into PPM,
+    or uncompressed PNG if it's transparent, which Tk can load without decoding again
+    """
+    if file is not None:
+        with open(file, "rb") as f:
+            raw = f.read()
+    elif isinstance(data, str):
+        try:
+            raw = base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            return data
+    else:
+        raw = data
+    PILImage = _import("PIL.Image")
+    if PILImage is None:
+        return raw
+    try:
+        with PILImage.open(io.BytesIO(raw)) as image:
+            if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+                output = io.BytesIO()
+                image.convert("RGBA").save(output, format="PNG", compress_level=0)
+                return output.getvalue()
+            image = image.convert("RGB")
+            return b"P6 %d %d 255\n" % image.size + image.tobytes()
+    except Exception:
+        return raw
+
+
+_ppm_header = re.compile(rb"P[56]\s+(\d+)\s+(\d+)\s+(\d+)\s")
+
+
+def _png_chunk(tag, body):
+    return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body))
+
+
+def _encode_png(pixels, width, height, channels, level):
+    """Encode a contiguous 8 bit gray, RGB or RGBA pixel buffer into PNG, without row filters"""
+    stride = width * channels
+    rows = b"".join(b"\0" + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    colortype = {1: 0, 3: 2, 4: 6}[channels]
+    png = b"\x89PNG\r\n\x1a\n"
+    png += _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, colortype, 0, 0, 0))
+    png += _png_chunk(b"IDAT", zlib.compress(rows, level))
+    png += _png_chunk(b"IEND", b"")
+    return png
+
+
+def _encode_pixels(pixels, width, height, channels):
+    """Wrap a contiguous 8 bit pixel buffer into PGM, PPM, or PNG if it has alpha"""
+    if channels == 1:
+        return b"P5 %d %d 255\n" % (width, height) + bytes(pixels), "ppm"
+    if channels == 3:
+        return b"P6 %d %d 255\n" % (width, height) + bytes(pixels), "ppm"
+    if channels == 4:
+        return _encode_png(pixels, width, height, 4, 1), "png"
+    raise ValueError("pixels must have 1, 3 or 4 channels, not {}".format(channels))
+
+
+def _export(data, filename, format):
+    """Encode a PPM snapshot, and write it into filename, in a worker process"""
+    header = _ppm_header.match(data)
+    width, height = int(header.group(1)), int(header.group(2))
+    channels = 3 if data[1:2] == b"6" else 1
+    pixels = memoryview(data)[header.end():header.end() + width * height * channels]
+    if format == "ppm":
+        output = data
+    elif format == "png":
+        output = _encode_png(pixels, width, height, channels, 6)
+    elif _import("PIL.Image") is not None:
+        buffer = io.BytesIO()
+        mode = "RGB" if channels == 3 else "L"
+        try:
+            _import("PIL.Image").frombuffer(mode, (width, height), bytes(pixels), "raw", mode, 0, 1).save(buffer, format=format.upper())
+        except KeyError:
+            raise ValueError("unknown image format {!r}".format(format)) from None
+        output = buffer.getvalue()
+    else:
+        raise ValueError("exporting to {} needs Pillow".format(format))
+    with open(filename, "wb") as f:
+        f.write(output)
+    return filename
+
+
+class _ExportBatch:
+    """
+    A running batch export. Snapshots are taken on the main thread a few at a time,
+    and encoded and written in worker processes
+    """
+
+    def __init__(self, master, jobs, progress, finished, workers):
+        self._master = master
+        self._jobs = list(jobs)
+        self._progress = progress
+        self._finished = finished
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        self._futures = []
+        self._next = 0
+        self._completed = 0
+        self._cancelled = False
+        self.results = [None] * len(self._jobs)
+        self._after = self._master.after_idle(self._step)
+
+    def _snapshot(self, job):
+        source, filename = job[0], job[1]
+        region = job[2] if len(job) > 2 else None
+        image = source._image if isinstance(source, Image) else source
+        options = ["-from", *region] if region is not None else []
+        data = self._master.tk.call(image.name, "data", "-format", "ppm", *options)
+        if isinstance(data, str):
+            data = data.encode("latin-1")
+        format = os.path.splitext(filename)[1].lower().lstrip(".")
+        return data, filename, {"pgm": "ppm", "pnm": "ppm", "jpg": "jpeg"}.get(format, format)
+
+    def _step(self):
+        """Take snapshots for about 10 milliseconds, then collect the finished encodings"""
+        deadline = time.monotonic() + 0.01
+        while not self._cancelled and self._next < len(self._jobs) and time.monotonic() < deadline:
+            index = self._next
+            self._next += 1
+            try:
+                future = self._pool.submit(_export, *self._snapshot(self._jobs[index]))
+            except Exception as error:
+                self._done(index, error)
+            else:
+                self._futures.append((index, future))
+        for index, future in [item for item in self._futures if item[1].done()]:
+            self._futures.remove((index, future))
+            self._done(index, CancelledError() if future.cancelled() else future.exception())
+        if self._futures or (self._next < len(self._jobs) and not self._cancelled):
+            self._after = self._master.after(20, self._step)
+        else:
+            self._after = None
+            self._pool.shutdown(wait=False)
+            for index in range(self._next, len(self._jobs)):
+                self.results[index] = CancelledError()
+            if self._finished is not None:
+                self._finished(self.results)
+
+    def _done(self, index, error):
+        self._completed += 1
+        self.results[index] = error
+        if self._progress is not None:
+            self._progress(self._completed, len(self._jobs))
+
+    def cancel(self):
+        """Stop taking snapshots, and drop the encodings that haven't started yet"""
+        self._cancelled = True
+        for index, future in self._futures:
+            future.cancel()
+
+    def done(self):
+        """Return True if every job has finished or has been cancelled"""
+        return self._after is None
+
+
+def _skip_subblocks(raw, position):
+    while raw[position]:
+        position += raw[position] + 1
+    return position + 1
+
+
+def _gif_frames(raw):
+    """Return the (delay, disposal) of each frame of a GIF, without decoding them"""
+    if raw[:6] not in (b"GIF87a", b"GIF89a"):
+        return []
+    flags = raw[10]
+    position = 13 + (3 * (2 << (flags & 7)) if flags & 0x80 else 0)
+    frames = []
+    delay = disposal = 0
+    try:
+        while raw[position] != 0x3B:
+            if raw[position] == 0x21:
+                label = raw[position + 1]
+                position += 2
+                if label == 0xF9 and raw[position] >= 4:
+                    disposal = (raw[position + 1] >> 2) & 7
+                    delay = int.from_bytes(raw[position + 2:position + 4], "little") * 10
+                position = _skip_subblocks(raw, position)
+            elif raw[position] == 0x2C:
+                flags = raw[position + 9]
+                position += 10 + (3 * (2 << (flags & 7)) if flags & 0x80 else 0) + 1
+                position = _skip_subblocks(raw, position)
+                frames.append((delay if delay >= 20 else 100, disposal))
+                delay = disposal = 0
+            else:
+                break
+    except IndexError:
+        pass
+    return frames
+
+
+def _resample(master, source, zoom, subsample):
+    """
+    Return a new PhotoImage of source zoomed, then subsampled, which picks the nearest
+    pixel for any zoom / subsample ratio. Tk subsamples first when both are given in
+    one copy, so that is only done when one of them is 1
+    """
+    image = tk.PhotoImage(master=master)
+    if zoom == 1 or subsample == 1:
+        master.tk.call(image.name, "copy", source.name, "-subsample", subsample, subsample, "-zoom", zoom, zoom)
+        return image
+    zoomed = master.tk.call("image", "create", "photo")
+    try:
+        master.tk.call(zoomed, "copy", source.name, "-zoom", zoom, zoom)
+        master.tk.call(image.name, "copy", zoomed, "-subsample", subsample, subsample)
+    finally:
+        master.tk.call("image", "delete", zoomed)
+    return image
+
+
+def _to_pillow(master, source):
+    """Return the pixels of a PhotoImage as a Pillow image, in RGB mode if it's opaque"""
+    data = master.tk.call(source.name, "data", "-format", "png")
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    with _import("PIL.Image").open(io.BytesIO(data)) as original:
+        image = original.convert("RGBA")
+    if image.getextrema()[3][0] == 255:
+        image = image.convert("RGB")
+    return image
+
+
+def _resize(master, original, width, height):
+    """
+    Return a new PhotoImage of a Pillow image resized to width x height, passed to Tk
+    as PPM, or as PNG with uncompressed data if it has alpha, so Tk only copies the pixels
+    """
+    resized = original.resize((width, height), _import("PIL.Image").LANCZOS, reducing_gap=3.0)
+    if resized.mode == "RGB":
+        data, format = _encode_pixels(resized.tobytes(), width, height, 3)
+    else:
+        data, format = _encode_png(resized.tobytes(), width, height, 4, 0), "png"
+    return tk.PhotoImage(master=master, data=data, format=format)
+
+
+class _ThumbnailCache:
+    """
+    Scaled down images stored on disk, keyed by the path, modification time and size
+    of the source file and by the thumbnail size, so that warm starts don't have to
+    decode the originals. When the files exceed maxbytes, the least recently used
+    ones are deleted
+    """
+
+    maxbytes = 256 * 1024 * 1024
+
+    def __init__(self, directory=None):
+        if directory is None:
+            base = os.environ.get("XDG_CACHE_HOME")
+            if not base and os.name == "nt":
+                base = os.environ.get("LOCALAPPDATA")
+            if not base:
+                base = os.path.join(os.path.expanduser("~"), ".cache")
+            directory = os.path.join(base, "tkinter-extension-widgets", "thumbnails")
+        self.directory = directory
+        self._size = None
+
+    def path(self, file, size):
+        """Return the path of the thumbnail of file, valid only while file doesn't change"""
+        path = os.path.abspath(file)
+        stat = os.stat(path)
+        key = "{}\0{}\0{}\0{}x{}".format(path, stat.st_mtime_ns, stat.st_size, *size)
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest() + ".png")
+
+    def load(self, master, file, size):
+        """Return a PhotoImage of the thumbnail of file, fitting in size, creating it if needed"""
+        if isinstance(size, int):
+            size = (size, size)
+        path = self.path(file, size)
+        try:
+            image = tk.PhotoImage(master=master, file=path)
+        except tk.TclError:
+            return self._store(master, file, size, path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+
+    def _store(self, master, file, size, path):
+        """Decode the original, scale it down, and save it"""
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(suffix=".png", dir=self.directory)
+        os.close(handle)
+        try:
+            PILImage = _import("PIL.Image")
+            if PILImage is not None:
+                with PILImage.open(file) as original:
+                    original.thumbnail(size)
+                    original.save(temporary, format="PNG")
+                image = tk.PhotoImage(master=master, file=temporary)
+            else:
+                image = tk.PhotoImage(master=master, file=file)
+                factor = math.ceil(max(image.width() / size[0], image.height() / size[1]))
+                if factor > 1:
+                    image = image.subsample(factor)
+                image.write(temporary, format="png")
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self._evict(os.path.getsize(path))
+        return image
+
+    def _evict(self, added):
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+        else:
+            self._size += added
+        if self._size <= self.maxbytes:
+            return
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in os.scandir(self.directory) if entry.is_file())
+        self._size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if self._size <= self.maxbytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Delete every thumbnail"""
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.is_file():
+                    os.remove(entry.path)
+        self._size = 0
+
+
+class _ImageCache:
+    """
+    Decoded PhotoImages shared between Image widgets, keyed by file path, modification
+    time and size, or by a hash of the image data. Images that no widget uses are kept
+    until the total size exceeds maxbytes, then the least recently used ones are dropped
+    """
+
+    maxbytes = 64 * 1024 * 1024
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._size = 0
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def _key(self, master, file, data):
+        interp = (master or tk._default_root).tk
+        if file is not None:
+            path = os.path.abspath(file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            return (interp, "file", path, stat.st_mtime_ns, stat.st_size)
+        if isinstance(data, str):
+            data = data.encode()
+        return (interp, "data", hashlib.sha1(data).hexdigest())
+
+    def acquire(self, master, file=None, data=None, decoded=None):
+        """
+        Return a (key, PhotoImage) pair, decoding the image only if it isn't cached,
+        from the already read data in decoded if it's given
+        """
+        key = self._key(master, file, data)
+        item = self._items.get(key) if key is not None else None
+        if item is None:
+            if decoded is not None:
+                image = tk.PhotoImage(master=master, data=decoded)
+            elif file is not None:
+                image = tk.PhotoImage(master=master, file=file)
+            else:
+                image = tk.PhotoImage(master=master, data=data)
+            if key is None:
+                return None, image
+            item = self._items[key] = [image, 0, image.width() * image.height() * 4]
+            self._size += item[2]
+        self._items.move_to_end(key)
+        item[1] += 1
+        self._evict()
+        return key, item[0]
+
+    def release(self, key):
+        """Drop one reference to a cached image"""
+        item = self._items.get(key)
+        if item is not None:
+            item[1] -= 1
+            self._evict()
+
+    def clear(self):
+        """Forget every image that isn't in use"""
+        for key in [key for key, item in self._items.items() if item[1] <= 0]:
+            self._size -= self._items.pop(key)[2]
+
+    def _evict(self):
+        if self._size <= self.maxbytes:
+            return
+        for key in [key for key, item in self._items.items() if item[1] <= 0]:
+            self._size -= self._items.pop(key)[2]
+            if self._size <= self.maxbytes:
+                break
+
 
 class Image(tk.Label):
     """An image display widget for tkinter"""
 
+    cache = _ImageCache()
+    thumbnails = _ThumbnailCache()
+    maxscales = 8
+    maxresample = 16 * 1024 * 1024
+
     def __init__(self, master, **kwargs):
         """
         Create an image
@@ -21,6 +474,18 @@ class Image(tk.Label):
             anchor (str): image anchor
             relief (str): image relief
             borderwidth (int): image borderwidth
+            cache (bool): share the decoded image with other Image widgets showing the same file or data (default is True)
+            asynchronous (bool): read and decode the image in a worker thread, and show the placeholder meanwhile (default is False)
+            placeholder (PhotoImage): image shown while an asynchronous image is loading (default is a blank image)
+            scale (float): display the image scaled by this factor (default is 1)
+            thumbnail (int or tuple): show the file scaled down to fit in this size, using the on-disk thumbnail cache
+            animate (bool): play animated GIFs (default is False)
+            maxframes (int): the number of decoded animation frames kept in memory (default is 100)
+            
+        Generates:
+        
+            virtual event: <<ImageLoaded>> when an asynchronous image has been loaded
+            virtual event: <<ImageFailed>> when an asynchronous image couldn't be read or decoded
             
         Methods:
             blank: display a transparent image
@@ -34,6 +499,12 @@ class Image(tk.Label):
                         default value is the same as x
             put: put row formatted colors to image starting from
                     position 'to', e.g. image.put("{red green} {blue yellow}", to=(4,6))
+            play: start or resume playing an animated GIF
+            pause: pause the animation
+            seek: show the given frame of the animation
+            put_array: put a block of gray, RGB or RGBA pixels from a NumPy array or a bytes-like object
+            scaled: return a PhotoImage of this image scaled by any factor
+            to_array: return the RGB pixels of the image as a NumPy array, or a memoryview
             write: write image to file 'filename' in 'format' starting from
                     position 'form_coords'
             zoom: return a new PhotoImage with the same image as this widget,
@@ -46,30 +517,240 @@ class Image(tk.Label):
         self._anchor = kwargs.pop("anchor", tk.CENTER)
         self._relief = kwargs.pop("relief", tk.FLAT)
         self._bd = kwargs.pop("borderwidth", 0)
-        if self._data is not None and self._file is None:
-            self._image = tk.PhotoImage(data=self._data)
-        elif self._file is not None and self._data is None:
-            self._image = tk.PhotoImage(file=self._file)
-        else:
-            raise Exception("Couldn't use image file and image data at the same time")
+        self._cache = kwargs.pop("cache", True)
+        self._async = kwargs.pop("asynchronous", False)
+        self._placeholder = kwargs.pop("placeholder", None)
+        self._scale = kwargs.pop("scale", 1)
+        self._thumbnail = kwargs.pop("thumbnail", None)
+        self._animate = kwargs.pop("animate", False)
+        self._maxframes = int(kwargs.pop("maxframes", 100))
+        self._gif = None
+        self._frames = OrderedDict()
+        self._frame = 0
+        self._playing = None
+        self._key = None
+        self._loading = None
+        self._levels = None
+        self._pillow = {}
+        self._scales = OrderedDict()
+        self._load(master)
         tk.Label.__init__(self, master, image=self._image, cursor=self._cursor, anchor=self._anchor, relief=self._relief, borderwidth=self._bd)
+        if self._scale != 1:
+            tk.Label.configure(self, image=self._displayed())
+        self._load_animation()
+        if self._gif is not None:
+            self.play()
     
     def __getitem__(self, key):
         return self.cget(key)
 
     def __setitem__(self, key, value):
         self.configure(**{key: value})
+
+    def _load(self, master):
+        """Create the PhotoImage, take it from the cache, or start loading it in the background"""
+        if (self._data is None) == (self._file is None):
+            raise Exception("Couldn't use image file and image data at the same time")
+        old = self._key
+        previous = getattr(self, "_image", None)
+        self._cancel_loading()
+        if self._async and self._thumbnail is None and not (self._cache and Image.cache._key(master, self._file, self._data) in Image.cache):
+            self._key = None
+            self._image = self._placeholder or tk.PhotoImage(master=master)
+            future = _submit(_decode, self._file, self._data)
+            self._loading = (future, master.after(20, self._poll, future))
+        else:
+            self._create(master)
+        if self._image is not previous:
+            self._reset_scales()
+        if old is not None:
+            Image.cache.release(old)
+
+    def _create(self, master, decoded=None):
+        if self._thumbnail is not None and self._file is not None:
+            self._key, self._image = None, Image.thumbnails.load(master, self._file, self._thumbnail)
+        elif self._cache:
+            self._key, self._image = Image.cache.acquire(master, self._file, self._data, decoded)
+        elif decoded is not None:
+            self._key, self._image = None, tk.PhotoImage(master=master, data=decoded)
+        elif self._file is not None:
+            self._key, self._image = None, tk.PhotoImage(master=master, file=self._file)
+        else:
+            self._key, self._image = None, tk.PhotoImage(master=master, data=self._data)
+
+    def _poll(self, future):
+        """Swap in the image loaded in the background once it's ready"""
+        if not future.done():
+            self._loading = (future, self.after(20, self._poll, future))
+            return
+        self._loading = None
+        try:
+            self._create(self, future.result())
+        except (OSError, tk.TclError):
+            self._key, self._image = None, tk.PhotoImage(master=self)
+            self._reset_scales()
+            tk.Label.configure(self, image=self._image)
+            self.event_generate("<<ImageFailed>>")
+            return
+        self._reset_scales()
+        tk.Label.configure(self, image=self._displayed())
+        self.event_generate("<<ImageLoaded>>")
+
+    def _cancel_loading(self):
+        if self._loading is not None:
+            future, after = self._loading
+            future.cancel()
+            self.after_cancel(after)
+            self._loading = None
+
+    def _own(self):
+        """Make a private copy of a shared image before modifying it"""
+        if self._key is not None:
+            self._image = self._image.copy()
+            if self._scale == 1:
+                tk.Label.configure(self, image=self._image)
+            Image.cache.release(self._key)
+            self._key = None
+
+    def _load_animation(self):
+        """Read the frame delays of an animated GIF, the frames are decoded only when needed"""
+        self.pause()
+        self._frames.clear()
+        self._frame = 0
+        self._gif = None
+        if not self._animate:
+            return
+        if self._file is not None:
+            with open(self._file, "rb") as f:
+                raw = f.read()
+        elif isinstance(self._data, str):
+            try:
+                raw = base64.b64decode(self._data)
+            except (binascii.Error, ValueError):
+                return
+        else:
+            raw = bytes(self._data)
+        frames = _gif_frames(raw)
+        if len(frames) > 1:
+            self._gif = (raw, frames, [0] + list(itertools.accumulate(delay for delay, disposal in frames)))
+
+    def _compose(self, index):
+        """Return a frame of the animation drawn over the frames before it, decoding them if needed"""
+        cached = self._frames.get(index)
+        if cached is not None:
+            self._frames.move_to_end(index)
+            return cached[0]
+        raw, frames, starts = self._gif
+        start = index
+        while start > 0 and start - 1 not in self._frames:
+            start -= 1
+        base = self._next_base(start - 1) if start > 0 else None
+        width, height = int.from_bytes(raw[6:8], "little"), int.from_bytes(raw[8:10], "little")
+        for current in range(start, index + 1):
+            image = tk.PhotoImage(master=self, width=width, height=height)
+            if base is not None:
+                self.tk.call(image.name, "copy", base.name)
+            frame = tk.PhotoImage(master=self, data=raw, format="gif -index {}".format(current))
+            self.tk.call(image.name, "copy", frame.name, "-compositingrule", "overlay")
+            # A frame disposed to the previous image keeps the base it was drawn on, for the next frame
+            self._frames[current] = (image, base if frames[current][1] == 3 else None)
+            base = self._next_base(current)
+            while len(self._frames) > max(1, self._maxframes):
+                self._frames.popitem(last=False)
+        return image
+
+    def _next_base(self, index):
+        """Return the image the frame after a cached frame is drawn on, according to its disposal method"""
+        image, before = self._frames[index]
+        disposal = self._gif[1][index][1]
+        if disposal == 2:
+            return None
+        elif disposal == 3:
+            return before
+        return image
+
+    def _show_frame(self, index):
+        self._frame = index
+        self._shown = self._compose(index)
+        tk.Label.configure(self, image=self._shown)
+
+    def _tick(self):
+        """Show the frame due now, skipping the frames the event loop fell behind on"""
+        raw, frames, starts = self._gif
+        elapsed = (time.monotonic() - self._playing[0]) * 1000 % starts[-1]
+        index = bisect.bisect_right(starts, elapsed) - 1
+        if index != self._frame or self._frames.get(index) is None:
+            self._show_frame(index)
+        after = self.after(max(1, int(starts[index + 1] - elapsed)), self._tick)
+        self._playing = (self._playing[0], after)
+        self.after_idle(self._prefetch, (index + 1) % len(frames))
+
+    def _prefetch(self, index):
+        if self._playing is not None and self._gif is not None:
+            self._compose(index)
+
+    def play(self):
+        """Start or resume playing an animated GIF"""
+        if self._gif is None or self._playing is not None:
+            return
+        starts = self._gif[2]
+        self._playing = (time.monotonic() - starts[self._frame] / 1000, None)
+        self._tick()
+
+    def pause(self):
+        """Pause the animation"""
+        if self._playing is not None:
+            if self._playing[1] is not None:
+                self.after_cancel(self._playing[1])
+            self._playing = None
+
+    def seek(self, frame):
+        """Show the given frame of the animation, and continue playing from there if it's playing"""
+        if self._gif is None:
+            raise ValueError("the image isn't animated")
+        playing = self._playing is not None
+        self.pause()
+        self._show_frame(frame % len(self._gif[1]))
+        if playing:
+            self.play()
+
+    def _reset_scales(self):
+        self._levels = None
+        self._pillow.clear()
+        self._scales.clear()
+
+    def _changed(self):
+        """Drop the scaled images after the pixels were modified, and update the displayed one"""
+        self._reset_scales()
+        if self._scale != 1:
+            tk.Label.configure(self, image=self._displayed())
+
+    def _displayed(self):
+        return self._image if self._scale == 1 else self.scaled(self._scale)
+
+    def destroy(self):
+        """Destroy this widget, and release its cached image"""
+        self._cancel_loading()
+        self.pause()
+        if self._key is not None:
+            Image.cache.release(self._key)
+            self._key = None
+        tk.Label.destroy(self)
         
     def clear(self):
         """Clear the image file and data from the widget, and blanks the image"""
         self._file = None
         self._data = None
+        self._own()
         self._image.blank()
+        self._changed()
         tk.Label.update(self)
         
     def blank(self):
         """Display a transparent image"""
+        self._own()
         self._image.blank()
+        self._changed()
         
     def copy(self):
         """Return a new PhotoImage with the same image as this widget"""
@@ -86,6 +767,52 @@ class Image(tk.Label):
         but use only every 'x'th or 'y'th pixel. If y is not given, the
         default value is the same as x"""
         return self._image.subsample(*args, **kwargs)
+
+    def scaled(self, factor):
+        """
+        Return a PhotoImage of this image scaled by any factor
+
+        The image is resampled from the nearest level of a lazily built pyramid
+        of halved images, and recently used scales are cached, so the returned
+        image is shared and shouldn't be modified
+        """
+        factor = float(factor)
+        if factor <= 0:
+            raise ValueError("the scale factor must be positive")
+        key = round(factor, 4)
+        image = self._scales.get(key)
+        if image is not None:
+            self._scales.move_to_end(key)
+            return image
+        if self._levels is None:
+            self._levels = [self._image]
+        level = 0
+        while factor * 2 ** (level + 1) <= 1 and min(self._levels[level].width(), self._levels[level].height()) > 1:
+            level += 1
+            if level == len(self._levels):
+                self._levels.append(_resample(self, self._levels[-1], 1, 2))
+        source = self._levels[level]
+        target = factor * 2 ** level
+        width, height = max(1, round(source.width() * target)), max(1, round(source.height() * target))
+        # Zooming by the numerator first needs an intermediate image denominator² times larger than
+        # the result, so the denominator is bounded by that size, Pillow resizes to the exact size
+        limit = max(1, min(64, int(math.sqrt(self.maxresample / (width * height)))))
+        ratio = max(Fraction(target).limit_denominator(limit), Fraction(1, limit))
+        if (width, height) == (source.width(), source.height()):
+            image = source
+        elif _import("PIL.Image") is not None:
+            # Exported from Tk once per level, so a new scale costs only the resize and a copy into Tk
+            if level not in self._pillow:
+                self._pillow[level] = _to_pillow(self, source)
+            image = _resize(self, self._pillow[level], width, height)
+        elif ratio == 1:
+            image = source
+        else:
+            image = _resample(self, source, ratio.numerator, ratio.denominator)
+        self._scales[key] = image
+        while len(self._scales) > self.maxscales:
+            self._scales.popitem(last=False)
+        return image
     
     def get(self, *args, **kwargs):
         """Return the color (red, green, blue) of the pixel at 'x','y'"""
@@ -94,8 +821,69 @@ class Image(tk.Label):
     def put(self, *args, **kwargs):
         """Put row formatted colors to image starting from
         position 'to', e.g. image.put("{red green} {blue yellow}", to=(4,6))"""
+        self._own()
         self._image.put(*args, **kwargs)
+        self._changed()
         
+    def put_array(self, pixels, to=(0, 0), width=None, height=None):
+        """
+        Put a block of 8 bit gray, RGB or RGBA pixels to the image starting from position 'to'
+
+        pixels is a NumPy array or a memoryview of shape (height, width, channels),
+        or a bytes-like object of the given width and height
+        """
+        # An array can only come from NumPy if it's already imported
+        numpy = sys.modules.get("numpy")
+        if numpy is not None and isinstance(pixels, numpy.ndarray):
+            pixels = numpy.ascontiguousarray(pixels, dtype=numpy.uint8)
+            if pixels.ndim == 2:
+                pixels = pixels[:, :, None]
+            height, width, channels = pixels.shape
+            pixels = pixels.data.cast("B")
+        else:
+            pixels = memoryview(pixels)
+            if pixels.ndim == 3:
+                height, width, channels = pixels.shape
+            elif width is None or height is None:
+                raise ValueError("width and height are needed for flat pixel buffers")
+            pixels = pixels.cast("B")
+            channels = len(pixels) // (width * height)
+            if channels * width * height != len(pixels):
+                raise ValueError("the size of pixels doesn't match width and height")
+        data, format = _encode_pixels(pixels, width, height, channels)
+        self._own()
+        self.tk.call(self._image.name, "put", data, "-format", format, "-to", *to)
+        self._changed()
+
+    def to_array(self):
+        """
+        Return the RGB pixels of the image as a NumPy array if it's available,
+        otherwise as a memoryview, of shape (height, width, 3), without copying them
+        """
+        data = self.tk.call(self._image.name, "data", "-format", "ppm")
+        if isinstance(data, str):
+            data = data.encode("latin-1")
+        header = _ppm_header.match(data)
+        width, height = int(header.group(1)), int(header.group(2))
+        numpy = _import("numpy")
+        if numpy is not None:
+            return numpy.frombuffer(data, dtype=numpy.uint8, count=width * height * 3, offset=header.end()).reshape(height, width, 3)
+        return memoryview(data)[header.end():header.end() + width * height * 3].cast("B", (height, width, 3))
+        
+    @staticmethod
+    def export_all(jobs, progress=None, finished=None, workers=None, master=None):
+        """
+        Write many images, or regions of images into files, without blocking the main loop
+
+        jobs is an iterable of (source, filename) or (source, filename, (x1, y1, x2, y2))
+        tuples, where source is an Image widget or a PhotoImage. The format comes from
+        the file extension, PNG and PPM are always supported, other formats need Pillow.
+        progress(completed, total) is called after each job, and finished(results) at the
+        end, with the exception of each failed or cancelled job, or None. Return the running batch,
+        which has a cancel and a done method
+        """
+        return _ExportBatch(master or tk._default_root, jobs, progress, finished, workers)
+
     def write(self, *args, **kwargs):
         """Write image to file 'filename' in 'format' starting from
         position 'form_coords'"""
@@ -117,20 +905,25 @@ class Image(tk.Label):
         self._anchor = kwargs.pop("anchor", self._anchor)
         self._relief = kwargs.pop("relief", self._relief)
         self._bd = kwargs.pop("borderwidth", self._bd)
-        if self._data is not None and self._file is None:
-            self._image = tk.PhotoImage(data=self._data)
-        elif self._file is not None and self._data is None:
-            self._image = tk.PhotoImage(file=self._file)
-        else:
-            raise Exception("Couldn't use image file and image data at the same time")
-        tk.Label.configure(self, image=self._image, cursor=self._cursor, anchor=self._anchor, relief=self._relief, borderwidth=self._bd)
+        self._cache = kwargs.pop("cache", self._cache)
+        self._async = kwargs.pop("asynchronous", self._async)
+        self._placeholder = kwargs.pop("placeholder", self._placeholder)
+        self._scale = kwargs.pop("scale", self._scale)
+        self._thumbnail = kwargs.pop("thumbnail", self._thumbnail)
+        self._animate = kwargs.pop("animate", self._animate)
+        self._maxframes = int(kwargs.pop("maxframes", self._maxframes))
+        self._load(self)
+        tk.Label.configure(self, image=self._displayed(), cursor=self._cursor, anchor=self._anchor, relief=self._relief, borderwidth=self._bd)
+        self._load_animation()
+        if self._gif is not None:
+            self.play()
         
     config = configure
     
     def cget(self, key):
         """Return the resource value for a KEY given as string"""
         if key == "file":
-            return self._text
+            return self._file
         elif key == "data":
             return self._data
         elif key == "cursor":
@@ -141,10 +934,255 @@ class Image(tk.Label):
             return self._relief
         elif key == "borderwidth":
             return self._bd
+        elif key == "cache":
+            return self._cache
+        elif key == "asynchronous":
+            return self._async
+        elif key == "placeholder":
+            return self._placeholder
+        elif key == "scale":
+            return self._scale
+        elif key == "thumbnail":
+            return self._thumbnail
+        elif key == "animate":
+            return self._animate
+        elif key == "maxframes":
+            return self._maxframes
         else:
             raise AttributeError(f"Image widget has no attribute '{key}'")
     
     def keys(self):
         """Return a list of all resource names of this widget"""
-        keys = ["anchor", "borderwidth", "cursor", "data", "file", "relief"]
+        keys = ["anchor", "animate", "asynchronous", "borderwidth", "cache", "cursor", "data", "file", "maxframes", "placeholder", "relief", "scale", "thumbnail"]
+        return keys
+
+
+class _PixelFile:
+    """Memory-mapped pixels of a binary PPM / PGM file, or of a raw 8 bit pixel file"""
+
+    def __init__(self, file, size=None, channels=3, offset=0):
+        self._file = open(file, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        if size is None:
+            header = _ppm_header.match(self._map[:64])
+            if header is None:
+                self.close()
+                raise ValueError("only binary PPM and PGM files can be tiled, or raw files with the size given")
+            if int(header.group(3)) > 255:
+                self.close()
+                raise ValueError("only 8 bit PPM and PGM files can be tiled")
+            self.width, self.height = int(header.group(1)), int(header.group(2))
+            self.channels = 3 if self._map[1:2] == b"6" else 1
+            self._offset = header.end()
+        else:
+            self.width, self.height = size
+            self.channels = channels
+            self._offset = offset
+        if len(self._map) < self._offset + self.width * self.height * self.channels:
+            self.close()
+            raise ValueError("the file is smaller than the size of the image")
+
+    def read(self, x, y, width, height):
+        """Return the pixels of a rectangle as a contiguous buffer"""
+        stride = self.width * self.channels
+        start = self._offset + y * stride + x * self.channels
+        length = width * self.channels
+        if width == self.width:
+            return self._map[start:start + height * stride]
+        return b"".join(self._map[start + row * stride:start + row * stride + length] for row in range(height))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class TiledImage(tk.Canvas):
+    """A scrollable viewport for very large images, that loads only the visible tiles"""
+
+    def __init__(self, master=None, **kwargs):
+        """
+        Create a tiled image viewport
+
+        Options:
+
+            file (str): path to a binary PPM or PGM file, or to a raw 8 bit pixel file
+            rawsize (tuple): the (width, height) of a raw pixel file
+            channels (int): the number of channels of a raw pixel file, 1, 3 or 4 (default is 3)
+            tilesize (int): the width and height of the tiles in pixels (default is 256)
+            maxtiles (int): the number of decoded tiles kept in memory (default is 64)
+            pan (bool): allow dragging the image with the mouse (default is True)
+            kwargs: options to be passed on to the tk.Canvas initializer
+
+        Generates:
+
+            virtual event: <<TiledImageUpdated>> after the visible tiles have been updated
+        """
+        self._file = kwargs.pop("file", None)
+        self._rawsize = kwargs.pop("rawsize", None)
+        self._channels = kwargs.pop("channels", 3)
+        self._tilesize = int(kwargs.pop("tilesize", 256))
+        self._maxtiles = int(kwargs.pop("maxtiles", 64))
+        self._pan = kwargs.pop("pan", True)
+        kwargs.setdefault("highlightthickness", 0)
+        tk.Canvas.__init__(self, master, **kwargs)
+        self._source = None
+        self._tiles = OrderedDict()
+        self._items = {}
+        self._after = None
+        self._open()
+        self.bind("<Configure>", self._schedule, add=True)
+        self.bind("<ButtonPress-1>", self._mark, add=True)
+        self.bind("<B1-Motion>", self._drag, add=True)
+
+    def __getitem__(self, key):
+        return self.cget(key)
+
+    def __setitem__(self, key, value):
+        self.configure(**{key: value})
+
+    def _open(self):
+        """Map the source file, and drop the tiles of the previous one"""
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        self.delete("tile")
+        self._items.clear()
+        self._tiles.clear()
+        if self._file is None:
+            tk.Canvas.configure(self, scrollregion=(0, 0, 0, 0))
+            return
+        self._source = _PixelFile(self._file, self._rawsize, self._channels)
+        tk.Canvas.configure(self, scrollregion=(0, 0, self._source.width, self._source.height))
+        self._schedule()
+
+    def _schedule(self, *args):
+        if self._after is None:
+            self._after = self.after_idle(self._update)
+
+    def _mark(self, event):
+        if self._pan:
+            self.scan_mark(event.x, event.y)
+
+    def _drag(self, event):
+        if self._pan:
+            self.scan_dragto(event.x, event.y, gain=1)
+            self._schedule()
+
+    def _tile(self, column, row):
+        """Return the PhotoImage of a tile, reading it from the file if it isn't cached"""
+        image = self._tiles.get((column, row))
+        if image is None:
+            size = self._tilesize
+            x, y = column * size, row * size
+            width = min(size, self._source.width - x)
+            height = min(size, self._source.height - y)
+            data, format = _encode_pixels(memoryview(self._source.read(x, y, width, height)), width, height, self._source.channels)
+            image = self._tiles[(column, row)] = tk.PhotoImage(master=self, data=data, format=format)
+        else:
+            self._tiles.move_to_end((column, row))
+        return image
+
+    def _update(self):
+        """Show the tiles intersecting the viewport, and forget the others"""
+        self._after = None
+        if self._source is None:
+            return
+        size = self._tilesize
+        left = max(0, int(self.canvasx(0)) // size)
+        top = max(0, int(self.canvasy(0)) // size)
+        right = min((self._source.width - 1) // size, int(self.canvasx(self.winfo_width())) // size)
+        bottom = min((self._source.height - 1) // size, int(self.canvasy(self.winfo_height())) // size)
+        visible = {(column, row) for column in range(left, right + 1) for row in range(top, bottom + 1)}
+        for tile in [tile for tile in self._items if tile not in visible]:
+            self.delete(self._items.pop(tile))
+        for column, row in visible:
+            image = self._tile(column, row)
+            if (column, row) not in self._items:
+                self._items[(column, row)] = self.create_image(column * size, row * size, image=image, anchor="nw", tags="tile")
+        limit = max(self._maxtiles, len(visible))
+        while len(self._tiles) > limit:
+            tile, image = self._tiles.popitem(last=False)
+            if tile in visible:
+                self._tiles[tile] = image
+        self.event_generate("<<TiledImageUpdated>>")
+
+    def xview(self, *args):
+        """Query and change the horizontal position of the view"""
+        result = tk.Canvas.xview(self, *args)
+        if args:
+            self._schedule()
+        return result
+
+    def yview(self, *args):
+        """Query and change the vertical position of the view"""
+        result = tk.Canvas.yview(self, *args)
+        if args:
+            self._schedule()
+        return result
+
+    def xview_moveto(self, fraction):
+        self.xview("moveto", fraction)
+
+    def xview_scroll(self, number, what):
+        self.xview("scroll", number, what)
+
+    def yview_moveto(self, fraction):
+        self.yview("moveto", fraction)
+
+    def yview_scroll(self, number, what):
+        self.yview("scroll", number, what)
+
+    def see(self, x, y):
+        """Scroll the view so that the pixel at x, y is at the top left corner"""
+        self.xview_moveto(x / max(1, self._source.width))
+        self.yview_moveto(y / max(1, self._source.height))
+
+    def destroy(self):
+        """Destroy this widget, and unmap its file"""
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        tk.Canvas.destroy(self)
+
+    def configure(self, **kwargs):
+        """Configure resources of the widget."""
+        reopen = any(key in kwargs for key in ("file", "rawsize", "channels", "tilesize"))
+        self._file = kwargs.pop("file", self._file)
+        self._rawsize = kwargs.pop("rawsize", self._rawsize)
+        self._channels = kwargs.pop("channels", self._channels)
+        self._tilesize = int(kwargs.pop("tilesize", self._tilesize))
+        self._maxtiles = int(kwargs.pop("maxtiles", self._maxtiles))
+        self._pan = kwargs.pop("pan", self._pan)
+        tk.Canvas.configure(self, **kwargs)
+        if reopen:
+            self._open()
+
+    config = configure
+
+    def cget(self, key):
+        """Return the resource value for a KEY given as string"""
+        if key == "file":
+            return self._file
+        elif key == "rawsize":
+            return self._rawsize
+        elif key == "channels":
+            return self._channels
+        elif key == "tilesize":
+            return self._tilesize
+        elif key == "maxtiles":
+            return self._maxtiles
+        elif key == "pan":
+            return self._pan
+        else:
+            return tk.Canvas.cget(self, key)
+
+    def keys(self):
+        """Return a list of all resource names of this widget"""
+        keys = tk.Canvas.keys(self)
+        keys.extend(["channels", "file", "maxtiles", "pan", "rawsize", "tilesize"])
+        keys.sort()
         return keys